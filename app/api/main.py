@@ -2,6 +2,7 @@
 
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 
 # Import bootstrap
@@ -40,7 +41,8 @@ app = FastAPI(
     title="Lark Approval System - DDD Architecture",
     description="Domain-driven design implementation with QR generation, validation, and notification domains",
     version="2.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -65,22 +67,28 @@ app.include_router(monitoring_router, prefix="/system")
 # app.include_router(debug_router, prefix="/debug")
 # app.include_router(manual_router, prefix="/manual")
 
+# Phần tĩnh của response "/" - dựng một lần khi import
+_ROOT_INFO = {
+    "service": "Lark Approval System",
+    "architecture": "DDD (Domain-Driven Design)",
+    "version": "2.0.0",
+    "domains": ["qr_generation", "validation", "notification"],
+}
+_ROOT_ENDPOINTS = {
+    "api_v2": "/api/v2",
+    "webhook": "/webhook",
+    "system": "/system",
+    "docs": "/docs"
+}
+
 # Root endpoints
 @app.get("/")
 async def root():
     """API root with system information"""
     return {
-        "service": "Lark Approval System",
-        "architecture": "DDD (Domain-Driven Design)",
-        "version": "2.0.0",
-        "domains": ["qr_generation", "validation", "notification"],
+        **_ROOT_INFO,
         "status": "healthy" if app_bootstrap.is_initialized else "initializing",
-        "endpoints": {
-            "api_v2": "/api/v2",
-            "webhook": "/webhook",
-            "system": "/system",
-            "docs": "/docs"
-        }
+        "endpoints": _ROOT_ENDPOINTS
     }
 
 @app.get("/health")
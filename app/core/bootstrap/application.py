@@ -1,4 +1,5 @@
 import asyncio
+import time
 from datetime import datetime
 from app.core.events.event_registry import event_registry
 from app.core.config.settings import settings
@@ -21,6 +22,9 @@ class ApplicationBootstrap:
         """Khởi tạo ApplicationBootstrap với trạng thái ban đầu."""
         self.startup_time = None
         self.is_initialized = False
+        # Mốc monotonic và chuỗi ISO của startup_time, tính một lần cho các endpoint health
+        self._startup_monotonic = None
+        self._startup_time_iso = None
         
     async def initialize(self):
         """
@@ -36,6 +40,8 @@ class ApplicationBootstrap:
         """
         print("🚀 Bắt đầu khởi tạo ứng dụng...")
         self.startup_time = datetime.now()
+        self._startup_monotonic = time.monotonic()
+        self._startup_time_iso = self.startup_time.isoformat()
         
         try:
             # 1. Đăng ký các event handlers
@@ -49,7 +55,7 @@ class ApplicationBootstrap:
             
             # Đánh dấu ứng dụng đã khởi tạo thành công
             self.is_initialized = True
-            elapsed = (datetime.now() - self.startup_time).total_seconds()
+            elapsed = time.monotonic() - self._startup_monotonic
             
             print(f"✅ Khởi tạo ứng dụng hoàn tất trong {elapsed:.2f}s")
             
@@ -184,9 +190,9 @@ class ApplicationBootstrap:
                 - version: Phiên bản ứng dụng
         """
         return {
-            "startup_time": self.startup_time.isoformat() if self.startup_time else None,
+            "startup_time": self._startup_time_iso,
             "is_initialized": self.is_initialized,
-            "uptime_seconds": (datetime.now() - self.startup_time).total_seconds() if self.startup_time else 0,
+            "uptime_seconds": time.monotonic() - self._startup_monotonic if self._startup_monotonic is not None else 0,
             "event_handlers": event_registry.get_registration_status(),
             "architecture": "DDD",
             "version": "2.0.0"
@@ -1,6 +1,7 @@
 from .settings import settings
 from .node_config import (
     APPROVAL_WORKFLOWS,
+    FINAL_INSTANCE_STATUSES,
     get_workflow_config,
     get_field_mapping,
     get_qr_trigger_config,
@@ -11,6 +12,7 @@ from .field_constants import FFN
 __all__ = [
     "settings", 
     "APPROVAL_WORKFLOWS",
+    "FINAL_INSTANCE_STATUSES",
     "get_workflow_config",
     "get_field_mapping",
     "get_qr_trigger_config",
@@ -1,5 +1,10 @@
+import sys
+
 from .field_constants import FFN
 
+# Trạng thái cuối cùng của một approval instance - không cần xử lý thêm
+FINAL_INSTANCE_STATUSES = frozenset({'REJECTED', 'CANCELED', 'DELETED'})
+
 APPROVAL_WORKFLOWS = {
     "FCF7110C-FA4B-42AA-93D2-209910F8A0B0": {
         "name": "Quy trình thanh toán tổng hợp mới",
@@ -71,6 +76,51 @@ APPROVAL_WORKFLOWS = {
 }
 
 
+def _intern_field_mappings(workflows: dict) -> None:
+    """
+    Intern tên trường trong field_mappings một lần khi load cấu hình, để mọi lần
+    gọi get_field_mapping đều trả về cùng một object chuỗi.
+    """
+    for workflow in workflows.values():
+        mappings = workflow.get('field_mappings', {})
+        for key, field_name in mappings.items():
+            if field_name:
+                mappings[key] = sys.intern(field_name)
+
+
+_intern_field_mappings(APPROVAL_WORKFLOWS)
+
+
+def _compile_field_mapping_table(workflows: dict) -> dict:
+    """
+    Dựng bảng tra cứu phẳng (approval_code, field_key) -> tên trường một lần khi
+    load cấu hình, để get_field_mapping chỉ cần một lần tra dict.
+    """
+    return {
+        (approval_code, field_key): field_name
+        for approval_code, workflow in workflows.items()
+        for field_key, field_name in workflow.get('field_mappings', {}).items()
+    }
+
+
+_FIELD_MAPPING_TABLE = _compile_field_mapping_table(APPROVAL_WORKFLOWS)
+
+
+def _compile_node_config_table(workflows: dict) -> dict:
+    """
+    Dựng bảng tra cứu phẳng (approval_code, node_id) -> cấu hình node một lần khi
+    load cấu hình, để get_node_config chỉ cần một lần tra dict.
+    """
+    return {
+        (approval_code, node_id): node_config
+        for approval_code, workflow in workflows.items()
+        for node_id, node_config in workflow.get('nodes', {}).items()
+    }
+
+
+_NODE_CONFIG_TABLE = _compile_node_config_table(APPROVAL_WORKFLOWS)
+
+
 def get_workflow_config(approval_code: str) -> dict:
     """
     Lấy toàn bộ cấu hình cho một quy trình phê duyệt dựa trên approval_code.
@@ -81,20 +131,14 @@ def get_node_config(approval_code: str, node_id: str) -> dict:
     """
     Lấy cấu hình chi tiết cho một node_id cụ thể trong một quy trình.
     """
-    workflow = get_workflow_config(approval_code)
-    if workflow and 'nodes' in workflow:
-        return workflow['nodes'].get(node_id)
-    return None
+    return _NODE_CONFIG_TABLE.get((approval_code, node_id))
 
 def get_field_mapping(approval_code: str, field_key: str) -> str:
     """
     Lấy tên trường thực tế từ key logic cho một quy trình.
     Ví dụ: get_field_mapping(code, "bank_name") -> "Ngân hàng"
     """
-    workflow = get_workflow_config(approval_code)
-    if workflow and 'field_mappings' in workflow:
-        return workflow['field_mappings'].get(field_key)
-    return None
+    return _FIELD_MAPPING_TABLE.get((approval_code, field_key))
 
 def get_qr_trigger_config(approval_code: str) -> list:
     """
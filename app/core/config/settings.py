@@ -22,6 +22,7 @@ class Settings:
     # Cấu hình cho FastAPI web server
     DEBUG: bool = os.getenv("DEBUG", "false").lower() == "true"  # Bật/tắt debug mode
     PORT: int = int(os.getenv("PORT", "8000"))                   # Port để chạy server
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()    # Mức log của ứng dụng (DEBUG/INFO/WARNING...)
     
     # ===== LARK/FEISHU API SETTINGS =====
     # Thông tin xác thực và endpoints cho Lark API
@@ -52,6 +53,7 @@ class Settings:
     # ===== CACHE & PERFORMANCE SETTINGS =====
     # Cấu hình cache để tối ưu performance và tránh duplicate requests
     QR_CACHE_DURATION_MINUTES: int = 5      # Thời gian cache QR generation (phút)
+    QR_CACHE_MAX_ENTRIES: int = 10000       # Số entry tối đa giữ trong QR cache
     TOKEN_CACHE_BUFFER_SECONDS: int = 300   # Buffer time trước khi token hết hạn (5 phút)
 
     # ===== FILE STORAGE SETTINGS =====
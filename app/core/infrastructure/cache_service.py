@@ -1,6 +1,16 @@
+import logging
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Dict, Optional
 
+from app.core.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Thời gian giữ validation alert trong cache (phút)
+VALIDATION_ALERT_CACHE_MINUTES = 10
+
 
 class CacheService:
     """
@@ -9,16 +19,50 @@ class CacheService:
     CacheService giúp tránh trùng lặp bằng cách cache thời điểm tạo QR codes
     và gửi validation alerts. Service này sử dụng in-memory cache với
     automatic expiration để tiết kiệm bộ nhớ.
+
+    Mỗi cache là một OrderedDict sắp theo thời điểm đánh dấu (entry cũ nhất ở đầu),
+    nên các entry hết hạn được dọn từ đầu dict ở mỗi lần truy cập mà không cần
+    duyệt toàn bộ cache. QR cache còn bị giới hạn bởi settings.QR_CACHE_MAX_ENTRIES
+    để bộ nhớ không tăng vô hạn.
     
     Attributes:
-        qr_generation_cache (Dict[str, datetime]): Cache thời điểm tạo QR codes
-        validation_alert_cache (Dict[str, datetime]): Cache thời điểm gửi validation alerts
+        qr_generation_cache (OrderedDict[str, float]): Cache thời điểm tạo QR codes (time.monotonic())
+        validation_alert_cache (OrderedDict[str, float]): Cache thời điểm gửi validation alerts (time.monotonic())
     """
+
+    __slots__ = ("qr_generation_cache", "validation_alert_cache",
+                 "_qr_retention_minutes", "_validation_retention_minutes")
     
     def __init__(self):
-        """Khởi tạo CacheService với các cache dictionary rỗng."""
-        self.qr_generation_cache: Dict[str, datetime] = {}
-        self.validation_alert_cache: Dict[str, datetime] = {}
+        """Khởi tạo CacheService với các cache rỗng."""
+        self.qr_generation_cache: "OrderedDict[str, float]" = OrderedDict()
+        self.validation_alert_cache: "OrderedDict[str, float]" = OrderedDict()
+        # Thời gian giữ entry (phút), nới rộng nếu có lần kiểm tra dùng thời gian cache dài hơn
+        self._qr_retention_minutes = settings.QR_CACHE_DURATION_MINUTES
+        self._validation_retention_minutes = VALIDATION_ALERT_CACHE_MINUTES
+
+    @staticmethod
+    def _evict_expired(cache: "OrderedDict[str, float]", retention_minutes: int,
+                       current_time: float) -> int:
+        """
+        Xóa các entry đã quá thời gian giữ, bắt đầu từ entry cũ nhất.
+        
+        Args:
+            cache (OrderedDict): Cache sắp theo thời điểm đánh dấu
+            retention_minutes (int): Thời gian giữ entry tính bằng phút
+            current_time (float): Thời điểm hiện tại theo time.monotonic()
+            
+        Returns:
+            int: Số entry đã bị xóa
+        """
+        cutoff = current_time - retention_minutes * 60
+        evicted = 0
+        while cache:
+            if next(iter(cache.values())) >= cutoff:
+                break
+            cache.popitem(last=False)
+            evicted += 1
+        return evicted
     
     def generate_cache_key(self, instance_code: str, node_id: str, qr_type: str) -> str:
         """
@@ -33,8 +77,7 @@ class CacheService:
             str: Cache key format: {instance_code}_{short_node_id}_{qr_type}
         """
         # Rút ngắn node_id để cache key không quá dài
-        short_node_id = node_id[:8] if len(node_id) > 8 else node_id
-        return f"{instance_code}_{short_node_id}_{qr_type}"
+        return f"{instance_code}_{node_id[:8]}_{qr_type}"
 
     def generate_validation_cache_key(self, instance_code: str, validation_type: str) -> str:
         """
@@ -63,31 +106,28 @@ class CacheService:
         Returns:
             bool: True nếu QR đã được tạo gần đây, False nếu chưa hoặc đã hết hạn
         """
-        try:
-            cache_key = self.generate_cache_key(instance_code, node_id, qr_type)
-            
-            # Kiểm tra xem cache key có tồn tại không
-            if cache_key not in self.qr_generation_cache:
-                print(f"🆕 Cache miss: {cache_key} - chưa từng tạo QR")
-                return False
-            
-            # Tính thời gian đã trải qua kể từ lần tạo QR cuối
-            generated_time = self.qr_generation_cache[cache_key]
-            current_time = datetime.now()
-            time_diff = current_time - generated_time
-            
-            # Nếu đã quá thời gian cache thì xóa entry và return False
-            if time_diff > timedelta(minutes=cache_duration_minutes):
-                del self.qr_generation_cache[cache_key] 
-                print(f"⏰ Cache đã hết hạn: {cache_key} ({time_diff.total_seconds()/60:.1f} phút trước)")
-                return False
-            
-            print(f"🔒 Cache hit: {cache_key} - QR đã tạo {time_diff.total_seconds()/60:.1f} phút trước")
-            return True
-            
-        except Exception as e:
-            print(f"❌ Lỗi khi kiểm tra cache: {e}")
+        cache_key = self.generate_cache_key(instance_code, node_id, qr_type)
+        current_time = time.monotonic()
+        self._qr_retention_minutes = max(self._qr_retention_minutes, cache_duration_minutes)
+        self._evict_expired(self.qr_generation_cache, self._qr_retention_minutes, current_time)
+        
+        # Chỉ tra cache một lần: None nghĩa là chưa có entry
+        generated_time = self.qr_generation_cache.get(cache_key)
+        if generated_time is None:
+            logger.debug("🆕 Cache miss: %s - chưa từng tạo QR", cache_key)
+            return False
+        
+        # Tính thời gian đã trải qua kể từ lần tạo QR cuối
+        elapsed_seconds = current_time - generated_time
+        
+        # Nếu đã quá thời gian cache thì xóa entry và return False
+        if elapsed_seconds > cache_duration_minutes * 60:
+            self.qr_generation_cache.pop(cache_key, None)
+            logger.debug("⏰ Cache đã hết hạn: %s (%.1f phút trước)", cache_key, elapsed_seconds/60)
             return False
+        
+        logger.debug("🔒 Cache hit: %s - QR đã tạo %.1f phút trước", cache_key, elapsed_seconds/60)
+        return True
 
     def is_validation_alert_recently_sent(self, instance_code: str, validation_type: str,
                                         cache_duration_minutes: int = 10) -> bool:
@@ -102,31 +142,28 @@ class CacheService:
         Returns:
             bool: True nếu alert đã được gửi gần đây, False nếu chưa hoặc đã hết hạn
         """
-        try:
-            cache_key = self.generate_validation_cache_key(instance_code, validation_type)
-            
-            # Kiểm tra xem cache key có tồn tại không
-            if cache_key not in self.validation_alert_cache:
-                print(f"🆕 Validation cache miss: {cache_key} - chưa từng gửi alert")
-                return False
-            
-            # Tính thời gian đã trải qua kể từ lần gửi alert cuối
-            sent_time = self.validation_alert_cache[cache_key]
-            current_time = datetime.now()
-            time_diff = current_time - sent_time
-            
-            # Nếu đã quá thời gian cache thì xóa entry và return False
-            if time_diff > timedelta(minutes=cache_duration_minutes):
-                del self.validation_alert_cache[cache_key]
-                print(f"⏰ Validation cache đã hết hạn: {cache_key} ({time_diff.total_seconds()/60:.1f} phút trước)")
-                return False
-            
-            print(f"🔒 Validation cache hit: {cache_key} - Alert đã gửi {time_diff.total_seconds()/60:.1f} phút trước")
-            return True
-            
-        except Exception as e:
-            print(f"❌ Lỗi khi kiểm tra validation cache: {e}")
+        cache_key = self.generate_validation_cache_key(instance_code, validation_type)
+        current_time = time.monotonic()
+        self._validation_retention_minutes = max(self._validation_retention_minutes, cache_duration_minutes)
+        self._evict_expired(self.validation_alert_cache, self._validation_retention_minutes, current_time)
+        
+        # Chỉ tra cache một lần: None nghĩa là chưa có entry
+        sent_time = self.validation_alert_cache.get(cache_key)
+        if sent_time is None:
+            logger.debug("🆕 Validation cache miss: %s - chưa từng gửi alert", cache_key)
+            return False
+        
+        # Tính thời gian đã trải qua kể từ lần gửi alert cuối
+        elapsed_seconds = current_time - sent_time
+        
+        # Nếu đã quá thời gian cache thì xóa entry và return False
+        if elapsed_seconds > cache_duration_minutes * 60:
+            self.validation_alert_cache.pop(cache_key, None)
+            logger.debug("⏰ Validation cache đã hết hạn: %s (%.1f phút trước)", cache_key, elapsed_seconds/60)
             return False
+        
+        logger.debug("🔒 Validation cache hit: %s - Alert đã gửi %.1f phút trước", cache_key, elapsed_seconds/60)
+        return True
 
     def mark_qr_as_generated(self, instance_code: str, node_id: str, qr_type: str):
         """
@@ -137,15 +174,18 @@ class CacheService:
             node_id (str): ID của node trong workflow
             qr_type (str): Loại QR code
         """
-        try:
-            cache_key = self.generate_cache_key(instance_code, node_id, qr_type)
-            self.qr_generation_cache[cache_key] = datetime.now()
-            
-            print(f"🔒 Đã đánh dấu QR được tạo: {cache_key}")
-            print(f"📊 Kích thước QR Cache: {len(self.qr_generation_cache)} entries")
-            
-        except Exception as e:
-            print(f"❌ Lỗi khi đánh dấu cache: {e}")
+        cache_key = self.generate_cache_key(instance_code, node_id, qr_type)
+        current_time = time.monotonic()
+        self._evict_expired(self.qr_generation_cache, self._qr_retention_minutes, current_time)
+        # Đưa key về cuối để giữ thứ tự theo thời điểm đánh dấu
+        self.qr_generation_cache[cache_key] = current_time
+        self.qr_generation_cache.move_to_end(cache_key)
+        # Giới hạn kích thước cache: bỏ entry cũ nhất khi vượt quá số entry cho phép
+        while len(self.qr_generation_cache) > settings.QR_CACHE_MAX_ENTRIES:
+            self.qr_generation_cache.popitem(last=False)
+        
+        logger.debug("🔒 Đã đánh dấu QR được tạo: %s", cache_key)
+        logger.debug("📊 Kích thước QR Cache: %s entries", len(self.qr_generation_cache))
 
     def mark_validation_alert_as_sent(self, instance_code: str, validation_type: str):
         """
@@ -155,15 +195,15 @@ class CacheService:
             instance_code (str): Mã instance của approval workflow
             validation_type (str): Loại validation error
         """
-        try:
-            cache_key = self.generate_validation_cache_key(instance_code, validation_type)
-            self.validation_alert_cache[cache_key] = datetime.now()
-            
-            print(f"🔒 Đã đánh dấu validation alert được gửi: {cache_key}")
-            print(f"📊 Kích thước Validation Cache: {len(self.validation_alert_cache)} entries")
-            
-        except Exception as e:
-            print(f"❌ Lỗi khi đánh dấu validation cache: {e}")
+        cache_key = self.generate_validation_cache_key(instance_code, validation_type)
+        current_time = time.monotonic()
+        self._evict_expired(self.validation_alert_cache, self._validation_retention_minutes, current_time)
+        # Đưa key về cuối để giữ thứ tự theo thời điểm đánh dấu
+        self.validation_alert_cache[cache_key] = current_time
+        self.validation_alert_cache.move_to_end(cache_key)
+        
+        logger.debug("🔒 Đã đánh dấu validation alert được gửi: %s", cache_key)
+        logger.debug("📊 Kích thước Validation Cache: %s entries", len(self.validation_alert_cache))
 
     def get_cache_status(self) -> Dict:
         """
@@ -176,44 +216,48 @@ class CacheService:
                 - current_time: Thời gian hiện tại
         """
         try:
-            current_time = datetime.now()
+            current_time = time.monotonic()
+            # Thời gian thực chỉ dùng để hiển thị các mốc thời gian dạng ISO
+            wall_time = datetime.now()
+            self._evict_expired(self.qr_generation_cache, self._qr_retention_minutes, current_time)
+            self._evict_expired(self.validation_alert_cache, self._validation_retention_minutes, current_time)
             
             # Tính toán trạng thái QR Cache
             active_qr_cache = {}
             for cache_key, generated_time in self.qr_generation_cache.items():
-                time_diff = current_time - generated_time
-                minutes_ago = time_diff.total_seconds() / 60
+                elapsed_seconds = current_time - generated_time
+                minutes_ago = elapsed_seconds / 60
                 
                 active_qr_cache[cache_key] = {
-                    'generated_at': generated_time.isoformat(),
+                    'generated_at': (wall_time - timedelta(seconds=elapsed_seconds)).isoformat(),
                     'minutes_ago': round(minutes_ago, 1),
-                    'will_expire_in_minutes': max(0, 5 - minutes_ago)  # 5 phút cho QR
+                    'will_expire_in_minutes': max(0, settings.QR_CACHE_DURATION_MINUTES - minutes_ago)
                 }
             
             # Tính toán trạng thái Validation Cache
             active_validation_cache = {}
             for cache_key, sent_time in self.validation_alert_cache.items():
-                time_diff = current_time - sent_time
-                minutes_ago = time_diff.total_seconds() / 60
+                elapsed_seconds = current_time - sent_time
+                minutes_ago = elapsed_seconds / 60
                 
                 active_validation_cache[cache_key] = {
-                    'sent_at': sent_time.isoformat(),
+                    'sent_at': (wall_time - timedelta(seconds=elapsed_seconds)).isoformat(),
                     'minutes_ago': round(minutes_ago, 1),
-                    'will_expire_in_minutes': max(0, 10 - minutes_ago)  # 10 phút cho validation
+                    'will_expire_in_minutes': max(0, VALIDATION_ALERT_CACHE_MINUTES - minutes_ago)
                 }
             
             return {
                 'qr_cache': {
                     'total_cached_qr': len(self.qr_generation_cache),
                     'active_cache': active_qr_cache,
-                    'cache_duration_minutes': 5
+                    'cache_duration_minutes': settings.QR_CACHE_DURATION_MINUTES
                 },
                 'validation_cache': {
                     'total_cached_alerts': len(self.validation_alert_cache),
                     'active_cache': active_validation_cache,
-                    'cache_duration_minutes': 10
+                    'cache_duration_minutes': VALIDATION_ALERT_CACHE_MINUTES
                 },
-                'current_time': current_time.isoformat()
+                'current_time': wall_time.isoformat()
             }
             
         except Exception as e:
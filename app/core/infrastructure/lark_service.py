@@ -1,9 +1,22 @@
+import asyncio
+import logging
+import orjson
 import requests
-import json
 from datetime import datetime
 from typing import Optional, Dict
 from app.core.config.settings import settings
 
+logger = logging.getLogger(__name__)
+
+# Text hiển thị cho từng loại QR trong comment
+QR_TYPE_DISPLAY = {
+    'advance': 'TẠM ỨNG',
+    'payment': 'THANH TOÁN'
+}
+
+# Template nội dung comment đính kèm mã QR
+COMMENT_TEMPLATE = "🏦 Mã VietQR {qr_type_display}\n💰 Số tiền: {amount:,} VND"
+
 
 class LarkService:
     """
@@ -15,32 +28,65 @@ class LarkService:
     - Upload hình ảnh lên Lark
     - Tạo comments với attachments
     
+    Các HTTP call dùng chung một requests.Session (giữ kết nối keep-alive tới Lark)
+    và chạy trong thread pool qua asyncio.to_thread để không chặn event loop.
+    
     Attributes:
         access_token_cache (Dict): Cache lưu trữ access token và thời gian hết hạn
     """
+
+    __slots__ = ("access_token_cache", "_session", "_token_lock")
     
     def __init__(self):
-        """Khởi tạo LarkService với token cache rỗng."""
+        """Khởi tạo LarkService với token cache rỗng và HTTP session dùng chung."""
         self.access_token_cache = {"token": None, "expires_at": None}
+        self._session = requests.Session()
+        # Chỉ một coroutine được làm mới token tại một thời điểm
+        self._token_lock = asyncio.Lock()
+
+    def _get_cached_token(self, current_time: float) -> Optional[str]:
+        """Trả về token đã cache nếu còn hiệu lực, ngược lại trả về None."""
+        if (self.access_token_cache["token"] and 
+            self.access_token_cache["expires_at"] and 
+            current_time < self.access_token_cache["expires_at"]):
+            return self.access_token_cache["token"]
+        return None
     
     async def get_access_token(self) -> Optional[str]:
         """
         Lấy access token từ LarkSuite API với caching mechanism.
         
         Method này sẽ sử dụng cached token nếu còn hiệu lực, otherwise
-        sẽ gọi API để lấy token mới và cache lại.
+        sẽ gọi API để lấy token mới và cache lại. Khi nhiều request cùng thấy
+        token hết hạn, chỉ request đầu tiên gọi API; các request còn lại chờ lock
+        rồi dùng token vừa được cache.
         
         Returns:
             Optional[str]: Access token nếu thành công, None nếu thất bại
         """
-        current_time = datetime.now().timestamp()
-        
         # Kiểm tra xem token đã cache còn hiệu lực không
-        if (self.access_token_cache["token"] and 
-            self.access_token_cache["expires_at"] and 
-            current_time < self.access_token_cache["expires_at"]):
-            return self.access_token_cache["token"]
+        token = self._get_cached_token(datetime.now().timestamp())
+        if token:
+            return token
         
+        async with self._token_lock:
+            # Kiểm tra lại sau khi có lock: request khác có thể vừa làm mới token
+            current_time = datetime.now().timestamp()
+            token = self._get_cached_token(current_time)
+            if token:
+                return token
+            return await self._fetch_access_token(current_time)
+
+    async def _fetch_access_token(self, current_time: float) -> Optional[str]:
+        """
+        Gọi API để lấy tenant access token mới và lưu vào cache.
+        
+        Args:
+            current_time (float): Timestamp hiện tại, dùng để tính thời điểm hết hạn
+            
+        Returns:
+            Optional[str]: Access token nếu thành công, None nếu thất bại
+        """
         try:
             # Gọi API để lấy tenant access token mới
             url = f"{settings.BASE_URL}/auth/v3/tenant_access_token/internal"
@@ -49,7 +95,7 @@ class LarkService:
                 "app_secret": settings.LARK_APP_SECRET
             }
             
-            response = requests.post(url, json=payload, timeout=10)
+            response = await asyncio.to_thread(self._session.post, url, json=payload, timeout=10)
             data = response.json()
             
             # Kiểm tra response từ API
@@ -61,14 +107,14 @@ class LarkService:
                 self.access_token_cache["token"] = token
                 self.access_token_cache["expires_at"] = current_time + expires_in - settings.TOKEN_CACHE_BUFFER_SECONDS
                 
-                print(f"✅ Lấy access token thành công")
+                logger.info("✅ Lấy access token thành công")
                 return token
             else:
-                print(f"❌ Lấy token thất bại: {data}")
+                logger.error("❌ Lấy token thất bại: %s", data)
                 return None
                 
         except Exception as e:
-            print(f"❌ Lỗi khi lấy token: {e}")
+            logger.error("❌ Lỗi khi lấy token: %s", e)
             return None
 
     async def get_approval_instance(self, instance_code: str, access_token: str) -> Optional[Dict]:
@@ -86,25 +132,25 @@ class LarkService:
             url = f"{settings.BASE_URL}/approval/v4/instances/{instance_code}"
             headers = {"Authorization": f"Bearer {access_token}"}
             
-            print(f"🔍 Đang lấy thông tin instance: {instance_code}")
-            response = requests.get(url, headers=headers, timeout=10)
+            logger.debug("🔍 Đang lấy thông tin instance: %s", instance_code)
+            response = await asyncio.to_thread(self._session.get, url, headers=headers, timeout=10)
             
             # Kiểm tra HTTP status code
             if response.status_code != 200:
-                print(f"❌ Lỗi HTTP khi gọi API: {response.status_code}")
+                logger.error("❌ Lỗi HTTP khi gọi API: %s", response.status_code)
                 return None
                 
             api_response = response.json()
             
             # Kiểm tra Lark API response code
             if api_response.get("code") != 0:
-                print(f"❌ Lỗi Lark API response: {api_response}")
+                logger.error("❌ Lỗi Lark API response: %s", api_response)
                 return None
                 
             return api_response
             
         except Exception as e:
-            print(f"❌ Lỗi khi lấy thông tin approval instance: {e}")
+            logger.error("❌ Lỗi khi lấy thông tin approval instance: %s", e)
             return None
 
     async def upload_image_to_approval(self, image_buffer, filename: str, access_token: str) -> Dict:
@@ -121,6 +167,7 @@ class LarkService:
                 - success (bool): Trạng thái upload
                 - file_code (str): Mã file từ Lark (nếu success)  
                 - file_url (str): URL file từ Lark (nếu success)
+                - file_size (int): Kích thước ảnh đã upload tính bằng byte (nếu success)
                 - error (str): Thông báo lỗi (nếu failed)
         """
         try:
@@ -138,8 +185,10 @@ class LarkService:
                 'Authorization': f'Bearer {access_token}'
             }
             
-            print(f"📤 Đang upload hình ảnh: {filename}")
-            response = requests.post(settings.APPROVAL_UPLOAD_URL, files=files, headers=headers)
+            logger.debug("📤 Đang upload hình ảnh: %s", filename)
+            response = await asyncio.to_thread(
+                self._session.post, settings.APPROVAL_UPLOAD_URL, files=files, headers=headers
+            )
             
             # Xử lý response từ upload API
             if response.status_code == 200:
@@ -147,29 +196,31 @@ class LarkService:
                 if data.get('code') == 0:
                     file_code = data['data']['code']
                     file_url = data['data']['url']
-                    print(f'✅ Upload hình ảnh thành công! File code: {file_code}')
+                    logger.info('✅ Upload hình ảnh thành công! File code: %s', file_code)
                     return {
                         'success': True,
                         'file_code': file_code,
-                        'file_url': file_url
+                        'file_url': file_url,
+                        'file_size': image_buffer.getbuffer().nbytes
                     }
                 else:
                     error_msg = f"Lỗi API: {data.get('msg')} (code: {data.get('code')})"
-                    print(f'❌ Upload thất bại: {error_msg}')
+                    logger.error('❌ Upload thất bại: %s', error_msg)
                     return {'success': False, 'error': error_msg}
             else:
                 error_msg = f"Lỗi HTTP: {response.status_code}"
-                print(f'❌ Upload thất bại: {error_msg}')
+                logger.error('❌ Upload thất bại: %s', error_msg)
                 return {'success': False, 'error': error_msg}
                 
         except Exception as e:
             error_msg = f"Exception: {str(e)}"
-            print(f"❌ Lỗi upload: {error_msg}")
+            logger.error("❌ Lỗi upload: %s", error_msg)
             return {'success': False, 'error': error_msg}
 
     async def create_enhanced_comment_with_image(self, instance_code: str, file_url: str, file_code: str, 
                                                filename: str, qr_type: str, amount: int, node_name: str,
-                                               access_token: str, user_id: str = None) -> Dict:
+                                               access_token: str, user_id: str = None,
+                                               file_size: Optional[int] = None) -> Dict:
         """
         Tạo comment với hình ảnh QR code và thông tin chi tiết.
         
@@ -183,6 +234,7 @@ class LarkService:
             node_name (str): Tên node trong workflow
             access_token (str): Access token để xác thực
             user_id (str, optional): User ID thực hiện comment
+            file_size (int, optional): Kích thước ảnh tính bằng byte (lấy từ kết quả upload)
             
         Returns:
             Dict: Dictionary chứa:
@@ -203,21 +255,15 @@ class LarkService:
                 "user_id_type": "user_id"
             }
             
-            # Tạo text hiển thị cho QR type
-            qr_type_display = {
-                'advance': 'TẠM ỨNG',
-                'payment': 'THANH TOÁN'
-            }
-            
             # Tạo nội dung comment với thông tin chi tiết
-            comment_text = f"""🏦 Mã VietQR {qr_type_display.get(qr_type, qr_type.upper())}
-💰 Số tiền: {amount:,} VND"""
+            comment_text = COMMENT_TEMPLATE.format(
+                qr_type_display=QR_TYPE_DISPLAY.get(qr_type) or qr_type.upper(),
+                amount=amount
+            )
 
-            # Ước tính kích thước file (rough estimate)
-            try:
-                file_size = len(filename) * 100  # Ước tính dựa trên độ dài filename
-            except:
-                file_size = 50000  # Giá trị mặc định
+            # Dùng kích thước thật của ảnh nếu có, ngược lại dùng giá trị mặc định
+            if file_size is None:
+                file_size = 50000
 
             # Tạo content data với text và file attachment
             content_data = {
@@ -233,7 +279,7 @@ class LarkService:
             
             # Request body với JSON content
             request_body = {
-                "content": json.dumps(content_data, ensure_ascii=False)
+                "content": orjson.dumps(content_data).decode()
             }
             
             headers_comment = {
@@ -241,11 +287,13 @@ class LarkService:
                 'Content-Type': 'application/json'
             }
             
-            print(f"📤 Đang tạo enhanced comment cho instance: {instance_code}")
-            print(f"   Nội dung: {comment_text.replace(chr(10), ' | ')}")
+            logger.debug("📤 Đang tạo enhanced comment cho instance: %s", instance_code)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("   Nội dung: %s", comment_text.replace(chr(10), ' | '))
             
             # Gọi API để tạo comment
-            response = requests.post(
+            response = await asyncio.to_thread(
+                self._session.post,
                 create_comment_url, 
                 params=params,
                 json=request_body, 
@@ -257,20 +305,20 @@ class LarkService:
                 comment_result = response.json()
                 if comment_result.get('code') == 0:
                     comment_id = comment_result.get("data", {}).get("comment_id", "N/A")
-                    print(f'✅ Tạo enhanced comment thành công! Comment ID: {comment_id}')
+                    logger.info('✅ Tạo enhanced comment thành công! Comment ID: %s', comment_id)
                     return {'success': True, 'comment_id': comment_id}
                 else:
                     error_msg = f"Lỗi API: {comment_result.get('msg')} (code: {comment_result.get('code')})"
-                    print(f'❌ Tạo comment thất bại: {error_msg}')
+                    logger.error('❌ Tạo comment thất bại: %s', error_msg)
                     return {'success': False, 'error': error_msg}
             else:
                 error_msg = f"Lỗi HTTP: {response.status_code}"
-                print(f'❌ Tạo comment thất bại: {error_msg}')
+                logger.error('❌ Tạo comment thất bại: %s', error_msg)
                 return {'success': False, 'error': error_msg}
                 
         except Exception as e:
             error_msg = f"Exception: {str(e)}"
-            print(f"❌ Lỗi tạo enhanced comment: {error_msg}")
+            logger.error("❌ Lỗi tạo enhanced comment: %s", error_msg)
             return {'success': False, 'error': error_msg}
 
 
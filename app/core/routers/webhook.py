@@ -1,12 +1,15 @@
-import json
+import logging
+
+import orjson
 
 from fastapi import APIRouter, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from app.core.infrastructure.event_bus import event_bus
 from app.core.utils.helpers import get_event_type, extract_instance_code
 from app.core.config.settings import settings
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 @router.post("/webhook")
 async def handle_lark_webhook(request: Request):
@@ -23,33 +26,23 @@ async def handle_lark_webhook(request: Request):
         request (Request): HTTP request chứa webhook data từ Lark
 
     Returns:
-        JSONResponse: 
+        dict | ORJSONResponse: 
             - Đối với URL verification: {"challenge": "..."}
             - Đối với events thành công: {"status": "success", "architecture": "DDD"}
             - Đối với lỗi: {"error": "..."} với status 500
     """
     try:
-        data = await request.json()
-
-        # =================================================================
-        # BẮT ĐẦU LOG DEBUG: In ra toàn bộ payload của webhook để kiểm tra
-        # =================================================================
-        #print("👇----- [DEBUG] BẮT ĐẦU PAYLOAD WEBHOOK THÔ -----👇")
-        # Sử dụng json.dumps để in ra cấu trúc JSON đẹp mắt, dễ đọc
-        #print(json.dumps(data, indent=2, ensure_ascii=False))
-        #print("👆----- [DEBUG] KẾT THÚC PAYLOAD WEBHOOK THÔ -----👆")
-        # =================================================================
-
+        data = orjson.loads(await request.body())
 
-        print(f"📨 Nhận được webhook: {get_event_type(data)}")
+        event_type = get_event_type(data)
+        logger.info("📨 Nhận được webhook: %s", event_type)
 
         # Xử lý xác thực URL khi setup webhook
         if data.get("type") == "url_verification":
-            print("🔐 Đang xử lý URL verification")
-            return JSONResponse(content={"challenge": data.get("challenge")})
+            logger.info("🔐 Đang xử lý URL verification")
+            return {"challenge": data.get("challenge")}
 
         # Xử lý các sự kiện phê duyệt thông qua event bus
-        event_type = get_event_type(data)
         if "approval" in event_type.lower():
             instance_code = extract_instance_code(data)
             if instance_code:
@@ -58,10 +51,10 @@ async def handle_lark_webhook(request: Request):
                 approval_code = event_body.get("approval_code")
 
                 if approval_code:
-                    print(f"🔍 Đang xử lý instance: {instance_code} cho quy trình: {approval_code}")
+                    logger.info("🔍 Đang xử lý instance: %s cho quy trình: %s", instance_code, approval_code)
 
                     # Thêm approval_code vào payload của event bus
-                    print("📡 Đang phát hành event qua event bus...")
+                    logger.debug("📡 Đang phát hành event qua event bus...")
                     await event_bus.publish("approval.instance.updated", {
                         "instance_code": instance_code,
                         "approval_code": approval_code,
@@ -69,15 +62,15 @@ async def handle_lark_webhook(request: Request):
                         "timestamp": data.get("header", {}).get("create_time"),
                         "raw_data": data
                     })
-                    print("✅ Đã phát hành event thành công")
+                    logger.debug("✅ Đã phát hành event thành công")
                 else:
-                    print(f"⚠️ Không tìm thấy 'approval_code' trong event cho instance: {instance_code}. Bỏ qua.")
+                    logger.warning("⚠️ Không tìm thấy 'approval_code' trong event cho instance: %s. Bỏ qua.", instance_code)
             else:
-                print("⚠️ Không tìm thấy 'instance_code' trong event phê duyệt.")
+                logger.warning("⚠️ Không tìm thấy 'instance_code' trong event phê duyệt.")
 
-        print("🎉 Xử lý webhook hoàn tất")
-        return JSONResponse(content={"status": "success", "architecture": "DDD"})
+        logger.debug("🎉 Xử lý webhook hoàn tất")
+        return {"status": "success", "architecture": "DDD"}
 
     except Exception as e:
-        print(f"❌ Lỗi khi xử lý webhook: {e}")
-        return JSONResponse(content={"error": str(e)}, status_code=500)
\ No newline at end of file
+        logger.exception("❌ Lỗi khi xử lý webhook: %s", e)
+        return ORJSONResponse(content={"error": str(e)}, status_code=500)
\ No newline at end of file
@@ -1,8 +1,7 @@
 from .helpers import extract_instance_code, get_event_type, format_currency, get_short_node_id
-from .field_extractor import FieldExtractor
-from .amount_detector import AmountDetector
+from .field_extractor import FieldExtractor, FormIndex
 
 __all__ = [
     "extract_instance_code", "get_event_type", "format_currency", "get_short_node_id",
-    "FieldExtractor", "AmountDetector"
+    "FieldExtractor", "FormIndex"
 ]
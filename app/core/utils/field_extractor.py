@@ -1,7 +1,100 @@
-from typing import List, Dict, Any, Optional
+import logging
+import math
+import re
+from dataclasses import dataclass, field as dataclass_field
+from typing import List, Dict, Any, Optional, Set, Iterable
+from app.core.config.field_constants import FFN
+
+logger = logging.getLogger(__name__)
+
+# Các trường số tiền được parse sẵn sang float khi build FormIndex
+DEFAULT_NUMERIC_FIELDS = frozenset({
+    FFN.ADVANCE_AMOUNT,
+    FFN.EXPENDITURE_AMOUNT,
+    FFN.REMAINING_PAYMENT_AMOUNT,
+    FFN.PAYMENT_AMOUNT,
+    FFN.TOTAL_PAYMENT_AMOUNT,
+})
+
+# Nhận diện tên trường số tiền ("tiền" hoặc "amount", không phân biệt hoa thường)
+_AMOUNT_FIELD_RE = re.compile(r'tiền|amount', re.IGNORECASE)
+
+
+@dataclass
+class FormIndex:
+    """
+    Chỉ mục tra cứu field theo tên, được xây dựng một lần từ form data.
+
+    Attributes:
+        values: Tên field -> giá trị đầu tiên tìm thấy (top-level và trong fieldList)
+        fieldlists: Tên fieldList -> danh sách các dòng (mỗi dòng là list các sub field)
+        numeric: Tên field -> giá trị đã parse sang float (NaN nếu parse lỗi)
+        errors: Tên field -> thông báo lỗi parse số
+    """
+    values: Dict[str, Any] = dataclass_field(default_factory=dict)
+    fieldlists: Dict[str, List[Any]] = dataclass_field(default_factory=dict)
+    numeric: Dict[str, float] = dataclass_field(default_factory=dict)
+    errors: Dict[str, str] = dataclass_field(default_factory=dict)
+
 
 class FieldExtractor:
-    def extract_field_value(self, form_data: List[Dict], field_name: str, debug: bool = False) -> Optional[Any]:
+    def build_index(self, form_data: List[Dict],
+                    numeric_fields: Iterable[str] = DEFAULT_NUMERIC_FIELDS) -> FormIndex:
+        """
+        Xây dựng FormIndex với một lần duyệt form data.
+
+        Thứ tự ưu tiên giống hệt `extract_field_value` / `extract_field_from_fieldlist`:
+        giá trị đầu tiên tìm thấy sẽ được giữ lại. Các trường trong `numeric_fields`
+        được parse sang float một lần để các validator không phải parse lại.
+
+        Args:
+            form_data: Form data từ API
+            numeric_fields: Tên các trường số tiền cần parse sẵn
+
+        Returns:
+            FormIndex: Chỉ mục để tra cứu O(1) theo tên field
+        """
+        index = FormIndex()
+        values = index.values
+        fieldlists = index.fieldlists
+
+        for field in form_data:
+            # Bỏ qua phần tử không phải dict
+            if not isinstance(field, dict):
+                continue
+            field_name = field.get('name')
+            if field_name is not None and field_name not in values:
+                values[field_name] = field.get('value')
+
+            if field.get('type') == 'fieldList':
+                field_list_values = field.get('value')
+                if not isinstance(field_list_values, list):
+                    field_list_values = []
+                if field_name is not None and field_name not in fieldlists:
+                    fieldlists[field_name] = field_list_values
+
+                for field_group in field_list_values:
+                    if isinstance(field_group, list):
+                        for sub_field in field_group:
+                            if isinstance(sub_field, dict):
+                                sub_field_name = sub_field.get('name')
+                                if sub_field_name is not None and sub_field_name not in values:
+                                    values[sub_field_name] = sub_field.get('value')
+
+        for field_name in numeric_fields:
+            raw_value = values.get(field_name)
+            if raw_value is None:
+                continue
+            try:
+                index.numeric[field_name] = float(raw_value)
+            except (ValueError, TypeError) as e:
+                index.numeric[field_name] = math.nan
+                index.errors[field_name] = str(e)
+
+        return index
+
+    def extract_field_value(self, form_data: List[Dict], field_name: str, debug: bool = False,
+                            form_index: Optional[FormIndex] = None) -> Optional[Any]:
         """
         Enhanced version: Trích xuất giá trị của một field từ form data với better error handling
         
@@ -9,44 +102,98 @@ class FieldExtractor:
             form_data (list): Form data từ API
             field_name (str): Tên field cần tìm
             debug (bool): In debug info
+            form_index (FormIndex, optional): Chỉ mục đã build sẵn, nếu có sẽ tra cứu O(1)
             
         Returns:
             Giá trị field hoặc None nếu không tìm thấy
         """
-        try:
-            if debug:
-                print(f"🔍 Searching for field: '{field_name}'")
-                
-            # Search in top-level fields
-            for field in form_data:
-                if field.get('name') == field_name:
-                    value = field.get('value')
-                    if debug:
-                        print(f"✅ Found '{field_name}' in top-level: {value}")
-                    return value
-                
-                # Search in nested fieldList
-                if field.get('type') == 'fieldList' and 'value' in field:
-                    field_list_values = field['value']
-                    if isinstance(field_list_values, list):
-                        for field_group in field_list_values:
-                            if isinstance(field_group, list):
-                                for sub_field in field_group:
-                                    if isinstance(sub_field, dict) and sub_field.get('name') == field_name:
-                                        value = sub_field.get('value')
-                                        if debug:
-                                            print(f"✅ Found '{field_name}' in fieldList: {value}")
-                                        return value
+        if form_index is not None:
+            return form_index.values.get(field_name)
+
+        if debug:
+            logger.debug("🔍 Searching for field: '%s'", field_name)
             
-            if debug:
-                print(f"❌ Field '{field_name}' not found")
-                print("Available fields:", [f.get('name') for f in form_data if f.get('name')])
-                
-            return None
+        # Search in top-level fields
+        for field in form_data:
+            # Bỏ qua phần tử không phải dict
+            if not isinstance(field, dict):
+                continue
+            if field.get('name') == field_name:
+                value = field.get('value')
+                if debug:
+                    logger.debug("✅ Found '%s' in top-level: %s", field_name, value)
+                return value
             
-        except Exception as e:
-            print(f"❌ Error extracting field '{field_name}': {e}")
-            return None
+            # Search in nested fieldList
+            if field.get('type') == 'fieldList' and 'value' in field:
+                field_list_values = field['value']
+                if isinstance(field_list_values, list):
+                    for field_group in field_list_values:
+                        if isinstance(field_group, list):
+                            for sub_field in field_group:
+                                if isinstance(sub_field, dict) and sub_field.get('name') == field_name:
+                                    value = sub_field.get('value')
+                                    if debug:
+                                        logger.debug("✅ Found '%s' in fieldList: %s", field_name, value)
+                                    return value
+        
+        if debug:
+            logger.debug("❌ Field '%s' not found", field_name)
+            logger.debug("Available fields: %s", [f.get('name') for f in form_data if f.get('name')])
+            
+        return None
+
+    def extract_field_values(self, form_data: List[Dict], names: Set[str],
+                             form_index: Optional[FormIndex] = None) -> Dict[str, Any]:
+        """
+        Trích xuất giá trị của nhiều field cùng lúc chỉ với một lần duyệt form data.
+
+        Cùng quy tắc tìm kiếm như `extract_field_value` (top-level và fieldList lồng nhau,
+        lấy giá trị đầu tiên tìm thấy), nhưng dừng sớm khi đã tìm đủ tất cả các field.
+
+        Args:
+            form_data: Form data từ API
+            names: Tập tên các field cần tìm
+            form_index (FormIndex, optional): Chỉ mục đã build sẵn, nếu có sẽ tra cứu O(1)
+
+        Returns:
+            Dict[str, Any]: Dict với key là tên field tìm thấy, value là giá trị của nó.
+                Field không tìm thấy sẽ không có trong dict.
+        """
+        if form_index is not None:
+            values = form_index.values
+            return {name: values[name] for name in names if name in values}
+
+        found = {}
+        if not names:
+            return found
+
+        for field in form_data:
+            # Bỏ qua phần tử không phải dict
+            if not isinstance(field, dict):
+                continue
+            field_name = field.get('name')
+            if field_name in names and field_name not in found:
+                found[field_name] = field.get('value')
+                if len(found) == len(names):
+                    return found
+
+            # Search in nested fieldList
+            if field.get('type') == 'fieldList' and 'value' in field:
+                field_list_values = field['value']
+                if isinstance(field_list_values, list):
+                    for field_group in field_list_values:
+                        if isinstance(field_group, list):
+                            for sub_field in field_group:
+                                if not isinstance(sub_field, dict):
+                                    continue
+                                sub_field_name = sub_field.get('name')
+                                if sub_field_name in names and sub_field_name not in found:
+                                    found[sub_field_name] = sub_field.get('value')
+                                    if len(found) == len(names):
+                                        return found
+
+        return found
 
     def get_all_field_names(self, form_data: List[Dict]) -> List[str]:
         """
@@ -56,31 +203,32 @@ class FieldExtractor:
             form_data: Form data từ API
             
         Returns:
-            List[str]: Danh sách tên fields
+            List[str]: Danh sách tên fields (không trùng lặp, theo thứ tự xuất hiện)
         """
-        field_names = []
+        # Dict dùng như ordered set: loại trùng lặp ngay khi duyệt, giữ thứ tự xuất hiện
+        field_names = {}
         
-        try:
-            for field in form_data:
-                field_name = field.get('name')
-                if field_name:
-                    field_names.append(field_name)
-                
-                # Check nested fieldList
-                if field.get('type') == 'fieldList' and 'value' in field:
-                    field_list_values = field['value']
-                    if isinstance(field_list_values, list):
-                        for field_group in field_list_values:
-                            if isinstance(field_group, list):
-                                for sub_field in field_group:
-                                    if isinstance(sub_field, dict):
-                                        sub_field_name = sub_field.get('name')
-                                        if sub_field_name:
-                                            field_names.append(sub_field_name)
-        except Exception as e:
-            print(f"❌ Error getting field names: {e}")
+        for field in form_data:
+            # Bỏ qua phần tử không phải dict
+            if not isinstance(field, dict):
+                continue
+            field_name = field.get('name')
+            if field_name:
+                field_names[field_name] = None
+            
+            # Check nested fieldList
+            if field.get('type') == 'fieldList' and 'value' in field:
+                field_list_values = field['value']
+                if isinstance(field_list_values, list):
+                    for field_group in field_list_values:
+                        if isinstance(field_group, list):
+                            for sub_field in field_group:
+                                if isinstance(sub_field, dict):
+                                    sub_field_name = sub_field.get('name')
+                                    if sub_field_name:
+                                        field_names[sub_field_name] = None
         
-        return list(set(field_names))  # Remove duplicates
+        return list(field_names)
 
     def get_amount_fields(self, form_data: List[Dict]) -> Dict[str, Any]:
         """
@@ -92,20 +240,17 @@ class FieldExtractor:
         Returns:
             Dict[str, Any]: Dict với field name là key, value là giá trị
         """
-        amount_fields = {}
-        
-        try:
-            for field in form_data:
-                field_name = field.get('name', '').lower()
-                if 'tiền' in field_name or 'amount' in field_name:
-                    amount_fields[field.get('name')] = field.get('value')
-        except Exception as e:
-            print(f"❌ Error getting amount fields: {e}")
-        
-        return amount_fields
+        return {
+            field_name: field.get('value')
+            for field in form_data
+            if isinstance(field, dict)
+            and isinstance(field_name := field.get('name'), str)
+            and _AMOUNT_FIELD_RE.search(field_name)
+        }
 
     def extract_field_from_fieldlist(self, form_data: List[Dict], fieldlist_name: str, 
-                                target_field_name: str, debug: bool = False) -> Optional[Any]:
+                                target_field_name: str, debug: bool = False,
+                                form_index: Optional[FormIndex] = None) -> Optional[Any]:
         """
         Trích xuất giá trị đầu tiên của một field từ bên trong một fieldList cụ thể.
         
@@ -117,46 +262,56 @@ class FieldExtractor:
             fieldlist_name: Tên fieldList container (vd: "Kế toán - Thông tin tạm ứng")  
             target_field_name: Tên field cần tìm (vd: "Số tiền chi")
             debug: In debug info
+            form_index (FormIndex, optional): Chỉ mục đã build sẵn, nếu có sẽ bỏ qua bước tìm fieldList
             
         Returns:
             Giá trị field hoặc None nếu không tìm thấy
         """
-        try:
-            if debug:
-                print(f"🔍 Searching for first '{target_field_name}' in fieldList '{fieldlist_name}'")
-                
-            if not fieldlist_name or not target_field_name:
-                if debug: print("❌ Invalid parameters: fieldlist_name and target_field_name required")
-                return None
-                
-            for field in form_data:
-                if field.get('name') == fieldlist_name and field.get('type') == 'fieldList':
-                    field_list_values = field.get('value', [])
-                    if debug: print(f"📋 Found fieldList '{fieldlist_name}' with {len(field_list_values)} items")
-                    
-                    for field_group in field_list_values:
-                        if isinstance(field_group, list):
-                            for sub_field in field_group:
-                                if isinstance(sub_field, dict) and sub_field.get('name') == target_field_name:
-                                    value = sub_field.get('value')
-                                    if debug: print(f"✅ Found first '{target_field_name}' = {value}")
-                                    return value
-                    
-                    if debug: print(f"❌ Field '{target_field_name}' not found in fieldList")
-                    return None
-            
-            if debug:
-                print(f"❌ fieldList '{fieldlist_name}' not found")
-                available = [f.get('name') for f in form_data if f.get('type') == 'fieldList']
-                print(f"Available fieldLists: {available}")
+        if debug:
+            logger.debug("🔍 Searching for first '%s' in fieldList '%s'", target_field_name, fieldlist_name)
+
+        if not fieldlist_name or not target_field_name:
+            if debug: logger.debug("❌ Invalid parameters: fieldlist_name and target_field_name required")
             return None
-            
-        except Exception as e:
-            print(f"❌ Error extracting field from fieldList: {e}")
+
+        if form_index is not None:
+            for field_group in form_index.fieldlists.get(fieldlist_name, []):
+                if isinstance(field_group, list):
+                    for sub_field in field_group:
+                        if isinstance(sub_field, dict) and sub_field.get('name') == target_field_name:
+                            return sub_field.get('value')
             return None
+
+        for field in form_data:
+            # Bỏ qua phần tử không phải dict
+            if not isinstance(field, dict):
+                continue
+            if field.get('name') == fieldlist_name and field.get('type') == 'fieldList':
+                field_list_values = field.get('value')
+                if not isinstance(field_list_values, list):
+                    field_list_values = []
+                if debug: logger.debug("📋 Found fieldList '%s' with %s items", fieldlist_name, len(field_list_values))
+
+                for field_group in field_list_values:
+                    if isinstance(field_group, list):
+                        for sub_field in field_group:
+                            if isinstance(sub_field, dict) and sub_field.get('name') == target_field_name:
+                                value = sub_field.get('value')
+                                if debug: logger.debug("✅ Found first '%s' = %s", target_field_name, value)
+                                return value
+
+                if debug: logger.debug("❌ Field '%s' not found in fieldList", target_field_name)
+                return None
+
+        if debug:
+            logger.debug("❌ fieldList '%s' not found", fieldlist_name)
+            available = [f.get('name') for f in form_data if isinstance(f, dict) and f.get('type') == 'fieldList']
+            logger.debug("Available fieldLists: %s", available)
+        return None
             
     def extract_all_values_from_fieldlist(self, form_data: List[Dict], fieldlist_name: str, 
-                                          target_field_name: str, debug: bool = False) -> List[Any]:
+                                          target_field_name: str, debug: bool = False,
+                                          form_index: Optional[FormIndex] = None) -> List[Any]:
         """
         ✅ MỚI: Trích xuất TẤT CẢ các giá trị của một field từ TẤT CẢ các dòng trong một fieldList.
         
@@ -168,44 +323,53 @@ class FieldExtractor:
             fieldlist_name: Tên của fieldList container (ví dụ: "Kế toán - Thông tin tạm ứng").
             target_field_name: Tên của field cần trích xuất giá trị (ví dụ: "Số tiền chi").
             debug: Bật/tắt in thông tin gỡ lỗi.
+            form_index (FormIndex, optional): Chỉ mục đã build sẵn, nếu có sẽ bỏ qua bước tìm fieldList.
             
         Returns:
             List[Any]: Một danh sách chứa tất cả các giá trị tìm thấy. Trả về list rỗng nếu không tìm thấy gì.
         """
         extracted_values = []
-        try:
-            if debug:
-                print(f"🔍 Searching for ALL '{target_field_name}' values in fieldList '{fieldlist_name}'")
-
-            for field in form_data:
-                if field.get('name') == fieldlist_name and field.get('type') == 'fieldList':
-                    field_list_values = field.get('value', [])
-                    if debug:
-                        print(f"📋 Found fieldList '{fieldlist_name}' with {len(field_list_values)} rows.")
-                    
-                    # Duyệt qua từng dòng (field_group) trong fieldList
-                    for i, field_group in enumerate(field_list_values):
-                        if isinstance(field_group, list):
-                            # Duyệt qua từng trường (sub_field) trong dòng
-                            for sub_field in field_group:
-                                if isinstance(sub_field, dict) and sub_field.get('name') == target_field_name:
-                                    value = sub_field.get('value')
-                                    extracted_values.append(value)
-                                    if debug:
-                                        print(f"   ✅ Row {i+1}: Found value '{value}'")
-                    
-                    # Sau khi duyệt xong, không cần tìm nữa
-                    if debug:
-                        print(f"📊 Total values found: {len(extracted_values)}")
-                    return extracted_values
-            
-            if debug:
-                print(f"❌ FieldList '{fieldlist_name}' not found in form data.")
+        if form_index is not None:
+            for field_group in form_index.fieldlists.get(fieldlist_name, []):
+                if isinstance(field_group, list):
+                    for sub_field in field_group:
+                        if isinstance(sub_field, dict) and sub_field.get('name') == target_field_name:
+                            extracted_values.append(sub_field.get('value'))
             return extracted_values
 
-        except Exception as e:
-            print(f"❌ Error extracting all values from fieldList: {e}")
-            return extracted_values
+        if debug:
+            logger.debug("🔍 Searching for ALL '%s' values in fieldList '%s'", target_field_name, fieldlist_name)
+
+        for field in form_data:
+            # Bỏ qua phần tử không phải dict
+            if not isinstance(field, dict):
+                continue
+            if field.get('name') == fieldlist_name and field.get('type') == 'fieldList':
+                field_list_values = field.get('value')
+                if not isinstance(field_list_values, list):
+                    field_list_values = []
+                if debug:
+                    logger.debug("📋 Found fieldList '%s' with %s rows.", fieldlist_name, len(field_list_values))
+
+                # Duyệt qua từng dòng (field_group) trong fieldList
+                for i, field_group in enumerate(field_list_values):
+                    if isinstance(field_group, list):
+                        # Duyệt qua từng trường (sub_field) trong dòng
+                        for sub_field in field_group:
+                            if isinstance(sub_field, dict) and sub_field.get('name') == target_field_name:
+                                value = sub_field.get('value')
+                                extracted_values.append(value)
+                                if debug:
+                                    logger.debug("   ✅ Row %s: Found value '%s'", i + 1, value)
+
+                # Sau khi duyệt xong, không cần tìm nữa
+                if debug:
+                    logger.debug("📊 Total values found: %s", len(extracted_values))
+                return extracted_values
+
+        if debug:
+            logger.debug("❌ FieldList '%s' not found in form data.", fieldlist_name)
+        return extracted_values
 
     def extract_fields_by_prefix(self, form_data: List[Dict], prefix: str, debug: bool = False) -> Dict[str, Any]:
         """
@@ -224,7 +388,7 @@ class FieldExtractor:
         extracted_fields = {}
         try:
             if debug:
-                print(f"🔍 Searching for all fields with prefix: '{prefix}'")
+                logger.debug("🔍 Searching for all fields with prefix: '%s'", prefix)
             
             # Duyệt qua tất cả các trường ở mọi cấp độ
             for field in form_data:
@@ -235,7 +399,7 @@ class FieldExtractor:
                     value = field.get('value')
                     extracted_fields[field_name] = value
                     if debug:
-                        print(f"   ✅ Found top-level field: '{field_name}' = {value}")
+                        logger.debug("   ✅ Found top-level field: '%s' = %s", field_name, value)
                 
                 # Kiểm tra các trường lồng trong fieldList
                 if field.get('type') == 'fieldList' and 'value' in field:
@@ -249,12 +413,12 @@ class FieldExtractor:
                                         value = sub_field.get('value')
                                         extracted_fields[sub_field_name] = value
                                         if debug:
-                                            print(f"   ✅ Found nested field: '{sub_field_name}' = {value}")
+                                            logger.debug("   ✅ Found nested field: '%s' = %s", sub_field_name, value)
             
             if debug:
-                print(f"📊 Total fields found with prefix: {len(extracted_fields)}")
+                logger.debug("📊 Total fields found with prefix: %s", len(extracted_fields))
             return extracted_fields
 
         except Exception as e:
-            print(f"❌ Error extracting fields by prefix '{prefix}': {e}")
+            logger.error("❌ Error extracting fields by prefix '%s': %s", prefix, e)
             return extracted_fields
\ No newline at end of file
@@ -1,8 +1,19 @@
 from typing import Optional, Dict, Any
 from datetime import datetime
-import pandas as pd
-import json
+import asyncio
+import csv
+import logging
+import orjson
 import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Thứ tự cột của file CSV lưu event
+EVENT_CSV_COLUMNS = ("timestamp", "event_type", "instance_code", "raw_event")
+
+# Tuần tự hóa các lần ghi để header chỉ được ghi một lần và các dòng không xen nhau
+_csv_write_lock = threading.Lock()
 
 def extract_instance_code(event_data: Dict) -> Optional[str]:
     """Trích xuất instance_code từ event"""
@@ -31,27 +42,33 @@ def get_event_type(event_data: Dict) -> str:
     except:
         return "unknown"
 
+def _append_csv_row(events_file: str, row: tuple) -> None:
+    """Ghi một dòng vào file CSV (blocking), tự thêm header nếu file chưa tồn tại"""
+    with _csv_write_lock:
+        write_header = not os.path.exists(events_file)
+        with open(events_file, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            if write_header:
+                writer.writerow(EVENT_CSV_COLUMNS)
+            writer.writerow(row)
+
 async def save_event_to_csv(event_data: Dict, events_file: str = "lark_events.csv"):
     """Lưu event vào CSV"""
     try:
-        row_data = {
-            "timestamp": datetime.now().isoformat(),
-            "event_type": get_event_type(event_data),
-            "instance_code": extract_instance_code(event_data),
-            "raw_event": json.dumps(event_data, ensure_ascii=False)
-        }
-        
-        df = pd.DataFrame([row_data])
+        row = (
+            datetime.now().isoformat(),
+            get_event_type(event_data),
+            extract_instance_code(event_data),
+            orjson.dumps(event_data).decode()
+        )
         
-        if os.path.exists(events_file):
-            df.to_csv(events_file, mode='a', header=False, index=False, encoding='utf-8')
-        else:
-            df.to_csv(events_file, mode='w', header=True, index=False, encoding='utf-8')
+        # Ghi file trong thread pool để không chặn event loop
+        await asyncio.to_thread(_append_csv_row, events_file, row)
             
-        print(f"✅ Event saved to {events_file}")
+        logger.debug("✅ Event saved to %s", events_file)
         
     except Exception as e:
-        print(f"❌ Error saving event: {e}")
+        logger.error("❌ Error saving event: %s", e)
 
 def format_currency(amount: float) -> str:
     """Format số tiền theo định dạng VND"""
@@ -12,7 +12,7 @@ __all__ = [
     
     # Validation Domain  
     "ValidationResult", "ValidationResponse", "ValidationType",
-    "validation_service", "validation_event_handler",
+    "get_validation_service", "validation_event_handler",
     
     # Notification Domain
     "NotificationResult", "NotificationType", "NotificationChannel",
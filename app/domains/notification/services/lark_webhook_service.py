@@ -1,8 +1,8 @@
 """
 Lark Webhook Service - Dịch vụ gửi thông báo qua Lark webhook
 """
+import orjson
 import requests
-import json
 from typing import List
 from datetime import datetime
 from app.core.config.settings import settings
@@ -118,7 +118,7 @@ class LarkWebhookService:
             response = requests.post(
                 self.webhook_url, 
                 headers=headers, 
-                data=json.dumps(message_data),
+                data=orjson.dumps(message_data),
                 timeout=10  # Timeout 10 giây để tránh treo
             )
             
@@ -225,7 +225,7 @@ class LarkWebhookService:
             response = requests.post(
                 self.webhook_url, 
                 headers=headers, 
-                data=json.dumps(message_data),
+                data=orjson.dumps(message_data),
                 timeout=10
             )
             
@@ -1,7 +1,11 @@
+import logging
 from typing import Dict
+from app.core.config.node_config import FINAL_INSTANCE_STATUSES
 from app.core.infrastructure.lark_service import lark_service
 from app.domains.qr_generation.services.qr_processor import qr_processor
 
+logger = logging.getLogger(__name__)
+
 class QREventHandler:
     """
     Bộ xử lý sự kiện tạo mã QR cho hệ thống phê duyệt Lark.
@@ -44,7 +48,7 @@ class QREventHandler:
             approval_code = event_data.get('approval_code')
 
             if not instance_code:
-                print(f"❌ [QR Handler] Thiếu instance_code trong dữ liệu sự kiện")
+                logger.error("❌ [QR Handler] Thiếu instance_code trong dữ liệu sự kiện")
                 return {
                     "success": False,
                     "message": "Không tìm thấy instance_code trong dữ liệu sự kiện", 
@@ -53,7 +57,7 @@ class QREventHandler:
             
             # [THÊM MỚI] Kiểm tra sự tồn tại của approval_code
             if not approval_code:
-                print(f"❌ [QR Handler] Thiếu approval_code trong dữ liệu sự kiện cho instance: {instance_code}")
+                logger.error("❌ [QR Handler] Thiếu approval_code trong dữ liệu sự kiện cho instance: %s", instance_code)
                 return {
                     "success": False,
                     "message": "Không tìm thấy approval_code trong dữ liệu sự kiện",
@@ -62,12 +66,11 @@ class QREventHandler:
                 }
 
             # Logic kiểm tra trạng thái đơn (giữ nguyên)
-            FINAL_STATUSES = ['REJECTED', 'CANCELED', 'DELETED']
             raw_data = event_data.get('raw_data', {})
             instance_status = raw_data.get('event', {}).get('object', {}).get('status')
             
-            if instance_status and instance_status in FINAL_STATUSES:
-                print(f"⏭️ [QR Handler] Bỏ qua instance {instance_code} do có trạng thái cuối cùng: {instance_status}")
+            if instance_status and instance_status in FINAL_INSTANCE_STATUSES:
+                logger.info("⏭️ [QR Handler] Bỏ qua instance %s do có trạng thái cuối cùng: %s", instance_code, instance_status)
                 return {
                     "success": True,
                     "message": f"Bỏ qua xử lý do trạng thái đơn là {instance_status}",
@@ -76,30 +79,30 @@ class QREventHandler:
                 }
             
             # [THAY ĐỔI] Cập nhật log để hiển thị cả approval_code
-            print(f"🏦 [QR Handler] Dịch vụ QR đang xử lý instance: {instance_code} (Workflow: {approval_code})")
+            logger.info("🏦 [QR Handler] Dịch vụ QR đang xử lý instance: %s (Workflow: %s)", instance_code, approval_code)
             
             # Lấy access token (giữ nguyên)
-            print(f"🔑 Đang lấy access token từ Lark...")
+            logger.debug("🔑 Đang lấy access token từ Lark...")
             access_token = await lark_service.get_access_token()
             if not access_token:
-                print(f"❌ Không thể lấy access token từ Lark")
+                logger.error("❌ Không thể lấy access token từ Lark")
                 return {
                     "success": False,
                     "message": "Không thể lấy access token từ Lark",
                     "service": self.name
                 }
             
-            print(f"✅ Đã lấy access token thành công")
+            logger.debug("✅ Đã lấy access token thành công")
             
             # [THAY ĐỔI] Truyền approval_code vào service xử lý logic nghiệp vụ
-            print(f"⚙️ Bắt đầu xử lý tạo QR cho {instance_code}...")
+            logger.debug("⚙️ Bắt đầu xử lý tạo QR cho %s...", instance_code)
             result = await qr_processor.process_approval_with_qr_comment(
                 instance_code, approval_code, access_token
             )
             
             # Xử lý kết quả trả về (giữ nguyên)
             if result:
-                print(f"✅ [QR Handler] Hoàn thành xử lý QR cho {instance_code}")
+                logger.info("✅ [QR Handler] Hoàn thành xử lý QR cho %s", instance_code)
                 return {
                     "success": True,
                     "message": f"Xử lý QR hoàn thành thành công cho {instance_code}",
@@ -107,7 +110,7 @@ class QREventHandler:
                     "service": self.name
                 }
             else:
-                print(f"❌ [QR Handler] Xử lý QR thất bại cho {instance_code}")
+                logger.error("❌ [QR Handler] Xử lý QR thất bại cho %s", instance_code)
                 return {
                     "success": False,
                     "message": f"Xử lý QR thất bại cho {instance_code}",
@@ -117,9 +120,7 @@ class QREventHandler:
             
         except Exception as e:
             # Xử lý lỗi (giữ nguyên)
-            print(f"❌ Lỗi không xác định trong QR Service: {str(e)}")
-            import traceback
-            print(f"📋 Chi tiết lỗi:\n{traceback.format_exc()}")
+            logger.exception("❌ Lỗi không xác định trong QR Service: %s", e)
             
             return {
                 "success": False,
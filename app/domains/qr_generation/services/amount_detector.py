@@ -1,9 +1,13 @@
+import logging
 from typing import Dict, List, Optional
 from app.core.config.node_config import get_node_config
 from app.core.config.field_constants import FFN
 from app.core.utils.field_extractor import FieldExtractor
+from app.core.utils.helpers import format_currency
 from app.domains.qr_generation.models import AmountDetectionResult, QRTypeResult, QRType
 
+logger = logging.getLogger(__name__)
+
 
 class AmountDetector:
     """
@@ -59,12 +63,14 @@ class AmountDetector:
             # Trích xuất giá trị từ cả 2 trường (chỉ khi tên trường không phải None)
             advance_value = None
             payment_value = None
+            # Duyệt form một lần để tra cứu cả hai trường
+            form_index = self.field_extractor.build_index(form_data, ())
             
             if advance_field:
-                advance_value = self.field_extractor.extract_field_value(form_data, advance_field)
+                advance_value = self.field_extractor.extract_field_value(form_data, advance_field, form_index=form_index)
             
             if payment_field:
-                payment_value = self.field_extractor.extract_field_value(form_data, payment_field)
+                payment_value = self.field_extractor.extract_field_value(form_data, payment_field, form_index=form_index)
             
             # Debug: Tìm tất cả trường có chứa từ khóa "tiền" hoặc "amount"
             all_amount_fields = self.field_extractor.get_amount_fields(form_data)
@@ -83,25 +89,25 @@ class AmountDetector:
             }
             
             # Hiển thị kết quả phát hiện trường
-            print(f"💰 Kết quả phát hiện trường số tiền:")
+            logger.debug("💰 Kết quả phát hiện trường số tiền:")
             if advance_field:
                 status = f"✅ {advance_value}" if advance_value else "❌ Không tìm thấy"
-                print(f"   - {advance_field}: {status}")
+                logger.debug("   - %s: %s", advance_field, status)
             else:
-                print(f"   - Trường tạm ứng: ❌ Chưa được cấu hình")
+                logger.debug("   - Trường tạm ứng: ❌ Chưa được cấu hình")
                 
             if payment_field:
                 status = f"✅ {payment_value}" if payment_value else "❌ Không tìm thấy"
-                print(f"   - {payment_field}: {status}")
+                logger.debug("   - %s: %s", payment_field, status)
             else:
-                print(f"   - Trường thanh toán: ❌ Chưa được cấu hình")
+                logger.debug("   - Trường thanh toán: ❌ Chưa được cấu hình")
                 
-            print(f"   - Tất cả trường số tiền: {list(all_amount_fields.keys())}")
+            logger.debug("   - Tất cả trường số tiền: %s", list(all_amount_fields.keys()))
             
             return result
             
         except Exception as e:
-            print(f"❌ Lỗi khi phát hiện trường số tiền: {e}")
+            logger.error("❌ Lỗi khi phát hiện trường số tiền: %s", e)
             return {
                 'advance_amount': None,
                 'payment_amount': None,
@@ -141,14 +147,15 @@ class AmountDetector:
             advance_field_name = fields_used.get('advance_field', FFN.ADVANCE_AMOUNT)
             payment_field_name = fields_used.get('payment_field', FFN.PAYMENT_AMOUNT)
 
-            print(f"🎯 Đang xác định loại QR: tạm_ứng={advance_found}, thanh_toán={payment_found}")
+            logger.debug("🎯 Đang xác định loại QR: tạm_ứng=%s, thanh_toán=%s", advance_found, payment_found)
             
             # Logic ưu tiên: Kiểm tra tạm ứng trước
             if advance_found and advance_amount:
                 try:
                     amount_value = float(advance_amount)
                     if amount_value > 0:
-                        print(f"✅ Chọn tạm ứng: {amount_value:,} VND")
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug("✅ Chọn tạm ứng: %s", format_currency(amount_value))
                         return {
                             'qr_type': 'advance',
                             'amount': amount_value,
@@ -156,14 +163,15 @@ class AmountDetector:
                             'reason': 'Tìm thấy số tiền tạm ứng hợp lệ'
                         }
                 except (ValueError, TypeError):
-                    print(f"⚠️ Số tiền tạm ứng không hợp lệ: {advance_amount}")
+                    logger.warning("⚠️ Số tiền tạm ứng không hợp lệ: %s", advance_amount)
             
             # Nếu không có tạm ứng, kiểm tra thanh toán
             if payment_found and payment_amount:
                 try:
                     amount_value = float(payment_amount)
                     if amount_value > 0:
-                        print(f"✅ Chọn thanh toán: {amount_value:,} VND")
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug("✅ Chọn thanh toán: %s", format_currency(amount_value))
                         return {
                             'qr_type': 'payment', 
                             'amount': amount_value,
@@ -171,10 +179,10 @@ class AmountDetector:
                             'reason': 'Tìm thấy số tiền thanh toán hợp lệ'
                         }
                 except (ValueError, TypeError):
-                    print(f"⚠️ Số tiền thanh toán không hợp lệ: {payment_amount}")
+                    logger.warning("⚠️ Số tiền thanh toán không hợp lệ: %s", payment_amount)
             
             # Không tìm thấy trường hợp lệ nào
-            print(f"❌ Không tìm thấy số tiền hợp lệ")
+            logger.error("❌ Không tìm thấy số tiền hợp lệ")
             return {
                 'qr_type': 'none',
                 'amount': None,
@@ -183,7 +191,7 @@ class AmountDetector:
             }
             
         except Exception as e:
-            print(f"❌ Lỗi khi xác định loại QR: {e}")
+            logger.error("❌ Lỗi khi xác định loại QR: %s", e)
             return {
                 'qr_type': 'none',
                 'amount': None,
@@ -218,7 +226,7 @@ class AmountDetector:
             # Lấy cấu hình node từ hệ thống
             node_config = get_node_config(node_id)
             if not node_config:
-                print(f"❌ Không tìm thấy cấu hình cho node {node_id}")
+                logger.error("❌ Không tìm thấy cấu hình cho node %s", node_id)
                 return {
                     'success': False,
                     'qr_type': 'none',
@@ -229,7 +237,7 @@ class AmountDetector:
             strategy = node_config['strategy']
             node_name = node_config['name']
             
-            print(f"🔍 Đang xử lý node: {node_name} (chiến lược: {strategy})")
+            logger.debug("🔍 Đang xử lý node: %s (chiến lược: %s)", node_name, strategy)
             
             # Phát hiện các trường có sẵn trong form
             field_detection = self.detect_available_amount_fields(form_data, node_config)
@@ -237,7 +245,7 @@ class AmountDetector:
             # Áp dụng chiến lược xử lý theo cấu hình
             if strategy == "detect_both_fields":
                 # Chiến lược phát hiện kép: có thể là tạm ứng hoặc thanh toán
-                print(f"📋 Áp dụng chiến lược phát hiện kép")
+                logger.debug("📋 Áp dụng chiến lược phát hiện kép")
                 qr_decision = self.determine_qr_type_by_fields(field_detection)
                 
                 return {
@@ -252,7 +260,7 @@ class AmountDetector:
                 
             elif strategy == "payment_field_only":
                 # Chiến lược chỉ thanh toán: chỉ kiểm tra trường thanh toán
-                print(f"💳 Áp dụng chiến lược chỉ thanh toán")
+                logger.debug("💳 Áp dụng chiến lược chỉ thanh toán")
                 payment_amount = field_detection.get('payment_amount')
                 payment_found = field_detection.get('payment_field_found', False)
                 payment_field_name = node_config.get('payment_field')
@@ -261,7 +269,8 @@ class AmountDetector:
                     try:
                         amount_value = float(payment_amount)
                         if amount_value > 0:
-                            print(f"✅ Tìm thấy số tiền thanh toán hợp lệ: {amount_value:,} VND")
+                            if logger.isEnabledFor(logging.DEBUG):
+                                logger.debug("✅ Tìm thấy số tiền thanh toán hợp lệ: %s", format_currency(amount_value))
                             return {
                                 'success': True,
                                 'qr_type': 'payment',
@@ -272,9 +281,9 @@ class AmountDetector:
                                 'field_detection': field_detection
                             }
                     except (ValueError, TypeError):
-                        print(f"⚠️ Số tiền thanh toán không hợp lệ: {payment_amount}")
+                        logger.warning("⚠️ Số tiền thanh toán không hợp lệ: %s", payment_amount)
                 
-                print(f"❌ Không tìm thấy số tiền thanh toán hợp lệ")
+                logger.error("❌ Không tìm thấy số tiền thanh toán hợp lệ")
                 return {
                     'success': False,
                     'qr_type': 'none',
@@ -286,7 +295,7 @@ class AmountDetector:
                 }
             
             else:
-                print(f"❌ Chiến lược không xác định: {strategy}")
+                logger.error("❌ Chiến lược không xác định: %s", strategy)
                 return {
                     'success': False,
                     'qr_type': 'none',
@@ -294,7 +303,7 @@ class AmountDetector:
                 }
                 
         except Exception as e:
-            print(f"❌ Lỗi khi xử lý node {node_id}: {e}")
+            logger.error("❌ Lỗi khi xử lý node %s: %s", node_id, e)
             return {
                 'success': False,
                 'qr_type': 'none',
@@ -1,13 +1,17 @@
-import json
+import asyncio
+import logging
+import orjson
 from app.core.config.settings import settings
 # [THAY ĐỔI] Import các hàm helper mới từ node_config
 from app.core.config.node_config import get_workflow_config, get_field_mapping, get_qr_trigger_config
 from app.core.infrastructure.lark_service import lark_service
 from app.core.infrastructure.cache_service import cache_service
-from app.core.utils.field_extractor import FieldExtractor
+from app.core.utils.field_extractor import FieldExtractor, FormIndex
 from app.domains.qr_generation.services.vietqr_service import vietqr_service
 from app.domains.qr_generation.models import QRType, BankInfo
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
 
 class QRProcessor:
     """
@@ -20,6 +24,8 @@ class QRProcessor:
         field_extractor (FieldExtractor): Bộ trích xuất trường dữ liệu từ form.
     """
 
+    __slots__ = ("field_extractor",)
+
     def __init__(self):
         """Khởi tạo QRProcessor với các service cần thiết."""
         self.field_extractor = FieldExtractor()
@@ -32,8 +38,13 @@ class QRProcessor:
             if amount_value is None:
                 return {'valid': False, 'amount': None, 'error': 'Số tiền không được để trống'}
             
-            amount_float = float(amount_value)
-            amount_int = int(amount_float)
+            # Số nguyên hoặc chuỗi chỉ gồm chữ số thì chuyển thẳng sang int, không qua float
+            if type(amount_value) is int:
+                amount_int = amount_value
+            elif isinstance(amount_value, str) and amount_value.isdecimal():
+                amount_int = int(amount_value)
+            else:
+                amount_int = int(float(amount_value))
             
             if amount_int <= 0:
                 return {'valid': False, 'amount': amount_int, 'error': 'Số tiền phải lớn hơn 0'}
@@ -43,17 +54,17 @@ class QRProcessor:
         except (ValueError, TypeError) as e:
             return {'valid': False, 'amount': None, 'error': f'Định dạng số tiền không hợp lệ: {str(e)}'}
 
-    def _find_active_qr_trigger(self, task_list: list, form_data: list, qr_trigger_configs: list) -> Dict[str, Any]:
+    def _find_active_qr_trigger(self, task_list: list, form_data: list, qr_trigger_configs: list,
+                                form_index: Optional[FormIndex] = None) -> Dict[str, Any]:
         """
         [HÀM MỚI] Tìm kiếm node đang hoạt động khớp với các điều kiện trong cấu hình qr_trigger_nodes.
+
+        Nếu truyền `form_index`, các trường Y/N và số tiền được tra cứu trên chỉ mục thay vì duyệt lại form.
         """
         # Tạo một map để tra cứu các node theo tên
         nodes_by_name = {}
         for task in task_list:
-            node_name = task.get('node_name', '')
-            if node_name not in nodes_by_name:
-                nodes_by_name[node_name] = []
-            nodes_by_name[node_name].append(task)
+            nodes_by_name.setdefault(task.get('node_name', ''), []).append(task)
             
         # Duyệt qua từng cấu hình trigger (ví dụ: một cho tạm ứng, một cho thanh toán)
         for trigger_config in qr_trigger_configs:
@@ -61,18 +72,19 @@ class QRProcessor:
             required_status = trigger_config.get("status")
 
             # Tìm tất cả các node có tên khớp với cấu hình
-            matching_nodes = []
-            for name, nodes in nodes_by_name.items():
-                if node_name_contains in name:
-                    matching_nodes.extend(nodes)
+            matching_nodes = [
+                node
+                for name, nodes in nodes_by_name.items() if node_name_contains in name
+                for node in nodes
+            ]
 
-            print(f"🔍 Tìm thấy {len(matching_nodes)} node có tên chứa '{node_name_contains}'.")
+            logger.debug("🔍 Tìm thấy %s node có tên chứa '%s'.", len(matching_nodes), node_name_contains)
 
             # Lặp qua các node đã tìm thấy để kiểm tra điều kiện
             for i, node in enumerate(matching_nodes, 1):
                 node_id = node.get('node_id')
                 node_status = node.get('status')
-                print(f"   - Kiểm tra lần {i} (Node ID: {node_id[:8]}..., Trạng thái: {node_status})...")
+                logger.debug("   - Kiểm tra lần %s (Node ID: %s..., Trạng thái: %s)...", i, node_id[:8], node_status)
 
                 if node_status == required_status:
                     # Lấy template từ config để tạo tên trường động
@@ -82,11 +94,11 @@ class QRProcessor:
                     yes_no_field_name = yes_no_field_template.format(i=i)
                     amount_field_name = amount_field_template.format(i=i)
 
-                    yes_no_value = self.field_extractor.extract_field_value(form_data, yes_no_field_name)
+                    yes_no_value = self.field_extractor.extract_field_value(form_data, yes_no_field_name, form_index=form_index)
                     
                     if yes_no_value == "Yes":
-                        print(f"     ✅ Điều kiện thỏa mãn: Node {required_status} và người dùng chọn 'Yes'.")
-                        amount_value = self.field_extractor.extract_field_value(form_data, amount_field_name)
+                        logger.debug("     ✅ Điều kiện thỏa mãn: Node %s và người dùng chọn 'Yes'.", required_status)
+                        amount_value = self.field_extractor.extract_field_value(form_data, amount_field_name, form_index=form_index)
                         
                         return {
                             "amount": amount_value,
@@ -97,9 +109,9 @@ class QRProcessor:
                             "trigger_round": i
                         }
                     else:
-                        print(f"     - Bỏ qua: Người dùng không chọn 'Yes' cho lần {i} (Giá trị: {yes_no_value}).")
+                        logger.debug("     - Bỏ qua: Người dùng không chọn 'Yes' cho lần %s (Giá trị: %s).", i, yes_no_value)
                 else:
-                    print(f"     - Bỏ qua: Trạng thái node không phải {required_status}.")
+                    logger.debug("     - Bỏ qua: Trạng thái node không phải %s.", required_status)
 
         return None # Không tìm thấy trigger nào hoạt động
 
@@ -112,26 +124,29 @@ class QRProcessor:
             # Bước 1: Lấy cấu hình cho quy trình hiện tại
             workflow_config = get_workflow_config(approval_code)
             if not workflow_config:
-                print(f"❌ Không tìm thấy cấu hình cho quy trình '{approval_code}'. Bỏ qua.")
+                logger.warning("❌ Không tìm thấy cấu hình cho quy trình '%s'. Bỏ qua.", approval_code)
                 return True # Coi như thành công vì không có gì để làm
 
-            print(f"⚙️ Áp dụng cấu hình cho quy trình: {workflow_config.get('name')}")
+            logger.info("⚙️ Áp dụng cấu hình cho quy trình: %s", workflow_config.get('name'))
 
             # Bước 2: Lấy thông tin chi tiết của instance
             api_response = await lark_service.get_approval_instance(instance_code, access_token)
             if not api_response or 'data' not in api_response:
-                print(f"❌ Không thể lấy thông tin instance {instance_code}")
+                logger.error("❌ Không thể lấy thông tin instance %s", instance_code)
                 return False
             
-            task_list = api_response['data'].get('task_list', [])
-            form_data = json.loads(api_response['data'].get('form', '[]'))
+            instance_data = api_response['data']
+            task_list = instance_data.get('task_list', [])
+            form_data = orjson.loads(instance_data.get('form', '[]'))
+            # Xây dựng chỉ mục form một lần, dùng chung cho mọi lần tra cứu trường bên dưới
+            form_index = self.field_extractor.build_index(form_data, ())
 
             # Bước 3: [LOGIC MỚI] Tìm node đang hoạt động dựa trên cấu hình
             qr_trigger_configs = workflow_config.get('qr_trigger_nodes', [])
-            active_trigger_info = self._find_active_qr_trigger(task_list, form_data, qr_trigger_configs)
+            active_trigger_info = self._find_active_qr_trigger(task_list, form_data, qr_trigger_configs, form_index)
 
             if not active_trigger_info:
-                print(f"⏭️ Không có trigger tạo QR nào đang hoạt động cho instance {instance_code}. Bỏ qua.")
+                logger.info("⏭️ Không có trigger tạo QR nào đang hoạt động cho instance %s. Bỏ qua.", instance_code)
                 return True
 
             # Bước 4: Trích xuất thông tin từ trigger đã tìm thấy
@@ -147,19 +162,19 @@ class QRProcessor:
                 instance_code, matching_node_id, qr_type, 
                 settings.QR_CACHE_DURATION_MINUTES
             ):
-                print(f"⚠️ PHÁT HIỆN TRÙNG LẶP: QR {qr_type.upper()} cho node {node_name} đã được tạo gần đây.")
+                logger.warning("⚠️ PHÁT HIỆN TRÙNG LẶP: QR %s cho node %s đã được tạo gần đây.", qr_type.upper(), node_name)
                 return True
             
-            print(f"💰 Chi tiết tạo QR cho lần {trigger_round}:")
-            print(f"   - Loại: {qr_type}")
-            print(f"   - Số tiền: {amount_value}")
-            print(f"   - Trường sử dụng: {field_used}")
-            print(f"   - Node kích hoạt: {node_name} ({matching_node_id[:8]}...)")
+            logger.debug("💰 Chi tiết tạo QR cho lần %s:", trigger_round)
+            logger.debug("   - Loại: %s", qr_type)
+            logger.debug("   - Số tiền: %s", amount_value)
+            logger.debug("   - Trường sử dụng: %s", field_used)
+            logger.debug("   - Node kích hoạt: %s (%s...)", node_name, matching_node_id[:8])
             
             # Bước 6: Validate số tiền
             amount_validation = self.validate_amount_value(amount_value)
             if not amount_validation['valid']:
-                print(f"❌ Số tiền không hợp lệ: {amount_validation['error']}")
+                logger.error("❌ Số tiền không hợp lệ: %s", amount_validation['error'])
                 return False
             amount_int = amount_validation['amount']
 
@@ -170,34 +185,38 @@ class QRProcessor:
             account_name_field = field_mappings.get('beneficiary_name')
 
             if not all([bank_id_field, account_no_field, account_name_field]):
-                 print(f"❌ Lỗi cấu hình: Thiếu 'bank_name', 'account_number', hoặc 'beneficiary_name' trong field_mappings của quy trình {approval_code}.")
+                 logger.error("❌ Lỗi cấu hình: Thiếu 'bank_name', 'account_number', hoặc 'beneficiary_name' trong field_mappings của quy trình %s.", approval_code)
                  return False
 
-            bank_id = self.field_extractor.extract_field_value(form_data, bank_id_field)
-            account_no = self.field_extractor.extract_field_value(form_data, account_no_field)
-            account_name = self.field_extractor.extract_field_value(form_data, account_name_field)
+            bank_values = self.field_extractor.extract_field_values(
+                form_data, {bank_id_field, account_no_field, account_name_field}, form_index=form_index
+            )
+            bank_id = bank_values.get(bank_id_field)
+            account_no = bank_values.get(account_no_field)
+            account_name = bank_values.get(account_name_field)
 
             if not all([bank_id, account_no, account_name]):
                 missing = [f for f, v in {bank_id_field: bank_id, account_no_field: account_no, account_name_field: account_name}.items() if not v]
-                print(f"❌ Thiếu thông tin ngân hàng trên form: {', '.join(missing)}")
+                logger.error("❌ Thiếu thông tin ngân hàng trên form: %s", ', '.join(missing))
                 return False
             
             # Bước 8: Tạo mô tả QR
             description = vietqr_service.generate_qr_description(f"{qr_type}{trigger_round}", instance_code)
             
-            # Bước 9: Tạo VietQR code
-            qr_image_buffer = vietqr_service.create_qr_in_memory(
+            # Bước 9: Tạo VietQR code (gọi HTTP + xử lý ảnh, chạy trong thread pool để không chặn event loop)
+            qr_image_buffer = await asyncio.to_thread(
+                vietqr_service.create_qr_in_memory,
                 bank_id, account_no, amount_int, description, account_name
             )
             if not qr_image_buffer:
-                print("❌ Không thể tạo mã VietQR")
+                logger.error("❌ Không thể tạo mã VietQR")
                 return False
             
             # Bước 10: Upload ảnh lên Lark
             filename = f"{instance_code}_{qr_type}{trigger_round}_qr.png"
             upload_result = await lark_service.upload_image_to_approval(qr_image_buffer, filename, access_token)
             if not upload_result['success']:
-                print(f"❌ Upload thất bại: {upload_result['error']}")
+                logger.error("❌ Upload thất bại: %s", upload_result['error'])
                 return False
             
             # Bước 11: Đánh dấu đã tạo QR
@@ -212,20 +231,19 @@ class QRProcessor:
                 qr_type=f"{qr_type.capitalize()} Lần {trigger_round}",
                 amount=amount_int,
                 node_name=node_name,
-                access_token=access_token
+                access_token=access_token,
+                file_size=upload_result['file_size']
             )
             
             if comment_result['success']:
-                print(f"✅ Hoàn thành xử lý phê duyệt {instance_code}")
+                logger.info("✅ Hoàn thành xử lý phê duyệt %s", instance_code)
                 return True
             else:
-                print(f"❌ Tạo comment thất bại: {comment_result['error']}")
+                logger.error("❌ Tạo comment thất bại: %s", comment_result['error'])
                 return False
                 
         except Exception as e:
-            print(f"❌ Lỗi nghiêm trọng khi xử lý phê duyệt: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("❌ Lỗi nghiêm trọng khi xử lý phê duyệt %s: %s", instance_code, e)
             return False
 
 qr_processor = QRProcessor()
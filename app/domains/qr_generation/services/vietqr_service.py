@@ -1,10 +1,18 @@
+import logging
+import threading
 import requests
+from collections import OrderedDict
 from urllib.parse import quote
 from PIL import Image
 from io import BytesIO
 from app.core.config.settings import settings
 from app.domains.qr_generation.models import QRType
 
+logger = logging.getLogger(__name__)
+
+# Số ảnh QR (PNG bytes) tối đa được giữ lại trong bộ nhớ
+QR_IMAGE_CACHE_MAX_ENTRIES = 512
+
 
 class VietQRService:
     """
@@ -16,13 +24,23 @@ class VietQRService:
     VietQR là hệ thống thanh toán QR code chuẩn của Việt Nam, cho phép
     tạo mã QR chứa thông tin ngân hàng, số tiền và nội dung chuyển khoản.
     
+    Các request tới VietQR dùng chung một requests.Session để giữ kết nối keep-alive,
+    tránh bắt tay TCP/TLS lại ở mỗi lần tạo QR. Ảnh PNG đã tạo được nhớ lại theo URL
+    request (LRU, tối đa QR_IMAGE_CACHE_MAX_ENTRIES ảnh), nên các sự kiện lặp lại cho cùng
+    thông tin thanh toán không gọi lại API.
+    
     Attributes:
         base_url (str): URL cơ sở của VietQR API từ settings
     """
 
     def __init__(self):
-        """Khởi tạo VietQRService với URL API từ cấu hình."""
+        """Khởi tạo VietQRService với URL API từ cấu hình và HTTP session dùng chung."""
         self.base_url = settings.VIETQR_BASE_URL
+        self._session = requests.Session()
+        # URL request -> PNG bytes, sắp theo thứ tự dùng gần nhất (cuối dict là mới nhất)
+        self._image_cache: "OrderedDict[str, bytes]" = OrderedDict()
+        # create_qr_in_memory được gọi từ thread pool nên cache cần khóa
+        self._image_cache_lock = threading.Lock()
     
     def create_qr_in_memory(self, bank_id: str, account_no: str, amount: int, 
                            description: str, account_name: str, 
@@ -63,50 +81,70 @@ class VietQRService:
         url = (f"{self.base_url}/{bank_id}-{account_no}-{template}.jpg?"
                f"amount={amount}&addInfo={encoded_desc}&accountName={encoded_name}")
         
-        print(f"🌐 URL VietQR: {url}")
+        logger.debug("🌐 URL VietQR: %s", url)
+
+        with self._image_cache_lock:
+            cached_png = self._image_cache.get(url)
+            if cached_png is not None:
+                self._image_cache.move_to_end(url)
+        if cached_png is not None:
+            logger.debug("🔒 Dùng lại ảnh QR đã tạo (%s bytes)", len(cached_png))
+            return BytesIO(cached_png)
         
         try:
             # Gửi HTTP GET request với timeout để tránh treo
-            print(f"📡 Đang gửi yêu cầu tạo QR đến VietQR API...")
-            response = requests.get(url, timeout=10)
+            logger.debug("📡 Đang gửi yêu cầu tạo QR đến VietQR API...")
+            response = self._session.get(url, timeout=10)
             response.raise_for_status()  # Raise exception nếu HTTP status code không thành công
             
-            print(f"✅ Nhận được dữ liệu QR từ API ({len(response.content)} bytes)")
+            logger.debug("✅ Nhận được dữ liệu QR từ API (%s bytes)", len(response.content))
             
             # Mở và xử lý hình ảnh từ response content
             image = Image.open(BytesIO(response.content))
-            print(f"🖼️ Đã tải ảnh QR - Kích thước: {image.size}, Mode: {image.mode}")
-            
-            # Chuyển đổi sang RGB nếu ảnh có mode không tương thích với PNG
-            # RGBA (có alpha channel), LA (grayscale + alpha), P (palette mode)
-            if image.mode in ('RGBA', 'LA', 'P'):
-                print(f"🔄 Chuyển đổi ảnh từ mode {image.mode} sang RGB")
-                image = image.convert('RGB')
+            logger.debug("🖼️ Đã tải ảnh QR - Kích thước: %s, Mode: %s", image.size, image.mode)
             
-            # Tạo BytesIO buffer để lưu ảnh PNG
-            img_buffer = BytesIO()
-            image.save(img_buffer, format='PNG')
-            img_buffer.seek(0)  # Reset con trở về đầu buffer để đọc từ đầu
+            # Image.open chỉ đọc header; nếu API đã trả về PNG không cần chuyển mode
+            # thì dùng thẳng bytes gốc, bỏ qua bước decode + encode lại
+            if image.format == 'PNG' and image.mode not in ('RGBA', 'LA', 'P'):
+                img_buffer = BytesIO(response.content)
+            else:
+                # Chuyển đổi sang RGB nếu ảnh có mode không tương thích với PNG
+                # RGBA (có alpha channel), LA (grayscale + alpha), P (palette mode)
+                if image.mode in ('RGBA', 'LA', 'P'):
+                    logger.debug("🔄 Chuyển đổi ảnh từ mode %s sang RGB", image.mode)
+                    image = image.convert('RGB')
+                
+                # Tạo BytesIO buffer để lưu ảnh PNG
+                img_buffer = BytesIO()
+                image.save(img_buffer, format='PNG')
+                img_buffer.seek(0)  # Reset con trở về đầu buffer để đọc từ đầu
+
+            # Lưu bytes (không lưu BytesIO) để mỗi lần dùng lại có buffer riêng
+            with self._image_cache_lock:
+                self._image_cache[url] = img_buffer.getvalue()
+                self._image_cache.move_to_end(url)
+                while len(self._image_cache) > QR_IMAGE_CACHE_MAX_ENTRIES:
+                    self._image_cache.popitem(last=False)
             
-            print(f"✅ Tạo mã VietQR thành công trong bộ nhớ")
-            print(f"📦 Kích thước buffer: {img_buffer.getbuffer().nbytes} bytes")
+            logger.info("✅ Tạo mã VietQR thành công trong bộ nhớ")
+            logger.debug("📦 Kích thước buffer: %s bytes", img_buffer.getbuffer().nbytes)
             return img_buffer
             
         except requests.exceptions.Timeout:
-            print(f"⏰ Timeout khi gọi VietQR API (quá 10 giây)")
+            logger.error("⏰ Timeout khi gọi VietQR API (quá 10 giây)")
             return None
         except requests.exceptions.ConnectionError:
-            print(f"🔌 Lỗi kết nối đến VietQR API")
+            logger.error("🔌 Lỗi kết nối đến VietQR API")
             return None
         except requests.exceptions.HTTPError as e:
-            print(f"🚫 Lỗi HTTP từ VietQR API: {e}")
-            print(f"    Status code: {response.status_code}")
+            logger.error("🚫 Lỗi HTTP từ VietQR API: %s", e)
+            logger.error("    Status code: %s", response.status_code)
             return None
         except requests.exceptions.RequestException as e:
-            print(f"❌ Lỗi request khi gọi VietQR API: {e}")
+            logger.error("❌ Lỗi request khi gọi VietQR API: %s", e)
             return None
         except Exception as e:
-            print(f"❌ Lỗi không xác định khi xử lý VietQR: {e}")
+            logger.error("❌ Lỗi không xác định khi xử lý VietQR: %s", e)
             return None
 
     def generate_qr_description(self, qr_type: str, instance_code: str) -> str:
@@ -136,14 +174,14 @@ class VietQRService:
         # Xác định mô tả dựa trên loại QR
         if qr_type == 'advance':
             description = f"Tam ung don {instance_code}"
-            print(f"📝 Tạo mô tả QR tạm ứng: {description}")
+            logger.debug("📝 Tạo mô tả QR tạm ứng: %s", description)
         elif qr_type == 'payment':
             description = f"Thanh toan don {instance_code}"
-            print(f"📝 Tạo mô tả QR thanh toán: {description}")
+            logger.debug("📝 Tạo mô tả QR thanh toán: %s", description)
         else:
             # Fallback cho các loại khác
             description = f"Don {instance_code}"
-            print(f"📝 Tạo mô tả QR chung: {description}")
+            logger.debug("📝 Tạo mô tả QR chung: %s", description)
             
         return description
 
@@ -7,7 +7,7 @@ __all__ = [
     # Models
     "ValidationType", "ValidationResult", "ValidationResponse",
     # Services
-    "validation_service",
+    "get_validation_service",
     # Handlers  
     "validation_event_handler"
 ]
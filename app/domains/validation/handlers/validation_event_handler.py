@@ -1,13 +1,17 @@
 """
 Validation Event Handler - Bộ xử lý sự kiện validation cho hệ thống phê duyệt
 """
+import logging
 from typing import Dict, List, Optional
-import json
-from app.domains.validation.services import validation_service
+import orjson
+from app.core.config.node_config import FINAL_INSTANCE_STATUSES
+from app.domains.validation.services import get_validation_service
 from app.core.infrastructure import lark_service
 from app.domains.notification.services import lark_webhook_service
 from app.core.infrastructure import cache_service
 
+logger = logging.getLogger(__name__)
+
 class ValidationEventHandler:
     """
     Bộ xử lý sự kiện validation cho hệ thống phê duyệt.
@@ -49,16 +53,14 @@ class ValidationEventHandler:
             }
 
         try:
-
-            FINAL_STATUSES = ['REJECTED', 'CANCELED', 'DELETED']
             raw_data = event_data.get('raw_data', {})
             instance_status = raw_data.get('event', {}).get('object', {}).get('status')
             event_body = raw_data.get('event', {})
             if not instance_status:
                 instance_status = event_body.get('status')
 
-            if instance_status and instance_status in FINAL_STATUSES:
-                print(f"⏭️ [Validation Handler] Bỏ qua instance {instance_code} do có trạng thái cuối cùng: {instance_status}")
+            if instance_status and instance_status in FINAL_INSTANCE_STATUSES:
+                logger.info("⏭️ [Validation Handler] Bỏ qua instance %s do có trạng thái cuối cùng: %s", instance_code, instance_status)
                 return {
                     "success": True,
                     "message": f"Bỏ qua validation do trạng thái đơn là {instance_status}",
@@ -67,7 +69,7 @@ class ValidationEventHandler:
                     "service": self.name
                 }
             
-            print(f"🔍 [Validation Handler] Dịch vụ Validation đang xử lý: {instance_code} (Workflow: {approval_code})")
+            logger.info("🔍 [Validation Handler] Dịch vụ Validation đang xử lý: %s (Workflow: %s)", instance_code, approval_code)
             
             # Lấy dữ liệu từ Lark (giữ nguyên)
             access_token = await lark_service.get_access_token()
@@ -78,11 +80,12 @@ class ValidationEventHandler:
             if not api_response or 'data' not in api_response:
                 return {"success": False, "message": "Không thể lấy dữ liệu instance", "service": self.name}
             
-            serial_number = api_response.get('data', {}).get('serial_number')
-            form_data = json.loads(api_response['data'].get('form', '[]'))
-            task_list = api_response['data'].get('task_list', [])
+            instance_data = api_response['data']
+            serial_number = instance_data.get('serial_number')
+            form_data = orjson.loads(instance_data.get('form', '[]'))
+            task_list = instance_data.get('task_list', [])
             
-            validation_results = validation_service.run_all_validations(
+            validation_results = get_validation_service().run_all_validations(
                 approval_code=approval_code, # <-- Tham số mới
                 form_data=form_data, 
                 task_list=task_list, 
@@ -91,7 +94,7 @@ class ValidationEventHandler:
             invalid_results = [r for r in validation_results if not r.is_valid]
             
             if not invalid_results:
-                print("✅ [Validation Handler] Tất cả validation đều thành công.")
+                logger.info("✅ [Validation Handler] Tất cả validation đều thành công.")
                 return {
                     "success": True, "message": "Tất cả validation đều thành công",
                     "webhook_sent": False, "webhook_skipped_count": 0,
@@ -101,36 +104,36 @@ class ValidationEventHandler:
             alerts_to_send = []
             skipped_count = 0
             
-            print(f"⚠️ [Validation Handler] Phát hiện {len(invalid_results)} vấn đề. Đang kiểm tra cache anti-spam...")
+            logger.warning("⚠️ [Validation Handler] Phát hiện %s vấn đề. Đang kiểm tra cache anti-spam...", len(invalid_results))
             for result in invalid_results:
                 specific_error_key = f"{result.validation_type.value}_{hash(result.message)}"
                 
                 if cache_service.is_validation_alert_recently_sent(
                     instance_code, specific_error_key, cache_duration_minutes=10
                 ):
-                    print(f"  🔄 Bỏ qua (đã cache): {result.message[:80]}...")
+                    logger.debug("  🔄 Bỏ qua (đã cache): %.80s...", result.message)
                     skipped_count += 1
                 else:
-                    print(f"  🆕 Cần gửi cảnh báo cho: {result.message[:80]}...")
+                    logger.debug("  🆕 Cần gửi cảnh báo cho: %.80s...", result.message)
                     alerts_to_send.append(result)
 
             webhook_sent = False
             if alerts_to_send:
                 error_messages = [r.message for r in alerts_to_send]
-                print(f"📨 [Validation Handler] Đang gửi {len(error_messages)} cảnh báo mới qua webhook...")
+                logger.info("📨 [Validation Handler] Đang gửi %s cảnh báo mới qua webhook...", len(error_messages))
                 
                 webhook_sent = await self._send_validation_alert(instance_code, error_messages, serial_number)
                 
                 if webhook_sent:
-                    print("✅ [Validation Handler] Gửi webhook thành công. Đang cập nhật cache...")
+                    logger.info("✅ [Validation Handler] Gửi webhook thành công. Đang cập nhật cache...")
                     for result in alerts_to_send:
                         specific_error_key = f"{result.validation_type.value}_{hash(result.message)}"
                         cache_service.mark_validation_alert_as_sent(instance_code, specific_error_key)
-                        print(f"  🔒 Đã cache cho: {result.message[:80]}...")
+                        logger.debug("  🔒 Đã cache cho: %.80s...", result.message)
                 else:
-                    print("❌ [Validation Handler] Gửi webhook thất bại.")
+                    logger.error("❌ [Validation Handler] Gửi webhook thất bại.")
             else:
-                print("✅ [Validation Handler] Không có cảnh báo mới nào cần gửi. Tất cả đã được cache.")
+                logger.info("✅ [Validation Handler] Không có cảnh báo mới nào cần gửi. Tất cả đã được cache.")
 
             return {
                 "success": True,
@@ -144,7 +147,7 @@ class ValidationEventHandler:
             
         except Exception as e:
             # Xử lý lỗi hệ thống (giữ nguyên)
-            print(f"❌ [Validation Handler] Lỗi nghiêm trọng trong Validation Service: {str(e)}")
+            logger.error("❌ [Validation Handler] Lỗi nghiêm trọng trong Validation Service: %s", e)
             return {
                 "success": False,
                 "message": f"Lỗi Validation Service: {str(e)}",
@@ -164,7 +167,7 @@ class ValidationEventHandler:
             result = await self.webhook_service.send_validation_alert(request)
             return result.success
         except Exception as e:
-            print(f"❌ Lỗi khi gửi validation alert: {e}")
+            logger.error("❌ Lỗi khi gửi validation alert: %s", e)
             return False
 
     async def _send_error_alert(self, instance_code: str, error_message: str) -> bool:
@@ -179,7 +182,7 @@ class ValidationEventHandler:
             result = await self.webhook_service.send_custom_alert(alert_request)
             return result.success
         except Exception as e:
-            print(f"❌ Lỗi khi gửi error alert: {e}")
+            logger.error("❌ Lỗi khi gửi error alert: %s", e)
             return False
 
 
@@ -1,11 +1,12 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from app.domains.validation.models import ValidationRequest, ValidationResponse
-from app.domains.validation.services.validation_service import validation_service
+from app.domains.validation.services.validation_service import ValidationService, get_validation_service
 
 router = APIRouter(prefix="/validation", tags=["Validation"])
 
 @router.post("/validate", response_model=ValidationResponse)
-async def validate_instance(request: ValidationRequest):
+async def validate_instance(request: ValidationRequest,
+                            validation_service: ValidationService = Depends(get_validation_service)):
     """Manual validation của một instance"""
     try:
         # Chạy validations
@@ -1,4 +1,4 @@
 # app/domains/validation/services/__init__.py
-from .validation_service import validation_service
+from .validation_service import get_validation_service
 
-__all__ = ["validation_service"]
+__all__ = ["get_validation_service"]
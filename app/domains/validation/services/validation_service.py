@@ -1,12 +1,81 @@
 """
 Validation Service - Dịch vụ domain cho các quy tắc validation
 """
-from typing import Dict, List, Any
+import logging
+from math import isclose
+from typing import Dict, List, Any, Optional, Tuple
 from app.domains.validation.models import ValidationResult, ValidationType
-from app.core.utils.field_extractor import FieldExtractor
+from app.core.utils.field_extractor import FieldExtractor, FormIndex, DEFAULT_NUMERIC_FIELDS
 # [THAY ĐỔI] Import các hàm helper mới
 from app.core.config.node_config import get_field_mapping
 
+logger = logging.getLogger(__name__)
+
+# Tên các trường tạm ứng của người dùng (cố định, 4 lần tạm ứng)
+_ADVANCE_FIELDS = tuple(f"Số tiền tạm ứng lần {i}:" for i in range(1, 5))
+_ADVANCE_FIELD_SET = frozenset(_ADVANCE_FIELDS)
+
+# Sai lệch tuyệt đối tối đa (VND) để hai số tiền được coi là khớp nhau
+_AMOUNT_TOL = 0.01
+
+# Các trường được parse sẵn sang float khi build FormIndex
+_NUMERIC_FIELDS = DEFAULT_NUMERIC_FIELDS | _ADVANCE_FIELD_SET
+
+# Mẫu kết quả SKIPPED dựng sẵn cho các thông báo cố định. Không trả trực tiếp các
+# instance này ra ngoài mà luôn đi qua `_copy_results` để mỗi webhook nhận bản riêng.
+_SKIPPED_NO_DATA = {
+    ValidationType.ADVANCE_AMOUNT_MISMATCH: (ValidationResult.create_skipped(
+        ValidationType.ADVANCE_AMOUNT_MISMATCH, "ℹ️ Bỏ qua: Không tìm thấy dữ liệu tạm ứng để so sánh."
+    ),),
+    ValidationType.PAYMENT_AMOUNT_MISMATCH: (ValidationResult.create_skipped(
+        ValidationType.PAYMENT_AMOUNT_MISMATCH, "ℹ️ Bỏ qua: Không tìm thấy đủ các trường về số tiền thanh toán để so sánh."
+    ),),
+}
+_SKIPPED_NO_CONFIG = {
+    ValidationType.ADVANCE_AMOUNT_MISMATCH: (ValidationResult.create_skipped(
+        ValidationType.ADVANCE_AMOUNT_MISMATCH,
+        "ℹ️ Bỏ qua: Cấu hình 'accounting_advance_info' hoặc 'expenditure_amount' bị thiếu."
+    ),),
+    ValidationType.PAYMENT_AMOUNT_MISMATCH: (ValidationResult.create_skipped(
+        ValidationType.PAYMENT_AMOUNT_MISMATCH,
+        "ℹ️ Bỏ qua: Cấu hình 'accounting_payment_info' hoặc 'expenditure_amount' bị thiếu."
+    ),),
+}
+
+# Kết quả trả về khi webhook không có form_data: không rule nào có dữ liệu để kiểm tra
+_SKIPPED_EMPTY_FORM = (ValidationResult.create_skipped(
+    ValidationType.FIELD_CONSISTENCY, "ℹ️ Bỏ qua: Không có dữ liệu form để kiểm tra."
+),)
+
+
+def _copy_results(templates: Tuple[ValidationResult, ...]) -> List[ValidationResult]:
+    """Tạo bản sao các kết quả mẫu, với `details` là dict mới cho mỗi bản."""
+    return [template.model_copy(update={"details": {}}) for template in templates]
+
+
+def _to_float(value: Any) -> Tuple[Optional[float], Optional[str]]:
+    """Chuyển giá trị sang float, trả về (số, None) hoặc (None, thông báo lỗi)."""
+    try:
+        return float(value), None
+    except (ValueError, TypeError) as e:
+        return None, str(e)
+
+
+def _amounts_match(a: float, b: float) -> bool:
+    """So sánh hai số tiền với sai số tuyệt đối `_AMOUNT_TOL` (không dùng sai số tương đối)."""
+    return isclose(a, b, rel_tol=0.0, abs_tol=_AMOUNT_TOL)
+
+
+def _indexed_float(form_index: Optional[FormIndex], field_name: str, raw_value: Any) -> Tuple[Optional[float], Optional[str]]:
+    """Lấy số đã được parse sẵn trong FormIndex, fallback về `_to_float` nếu chưa có."""
+    if form_index is not None and field_name in form_index.numeric:
+        error = form_index.errors.get(field_name)
+        if error is not None:
+            return None, error
+        return form_index.numeric[field_name], None
+    return _to_float(raw_value)
+
+
 class ValidationService:
     """
     Dịch vụ validation cho hệ thống phê duyệt.
@@ -14,16 +83,21 @@ class ValidationService:
     [NÂNG CẤP] Class này giờ đây đọc cấu hình field_mappings động dựa trên
     approval_code để hỗ trợ các quy tắc validation cho nhiều quy trình.
     """
+
+    __slots__ = ("field_extractor", "validation_rules", "_rules_seq")
     
     def __init__(self):
         """Khởi tạo ValidationService với field extractor và mapping rules."""
         self.field_extractor = FieldExtractor()
         
+        # Mỗi validator nhận (approval_code, form_data, **kwargs) và trả về List[ValidationResult]
         self.validation_rules = {
             ValidationType.ADVANCE_AMOUNT_MISMATCH: self.validate_advance_amount_mismatch,
             ValidationType.PAYMENT_AMOUNT_MISMATCH: self.validate_payment_amount_mismatch,
             # Các quy tắc khác có thể được thêm vào đây
         }
+        # Bản tuple cố định theo thứ tự đăng ký, dùng khi duyệt toàn bộ rule
+        self._rules_seq = tuple(self.validation_rules.items())
     
     # [THAY ĐỔI] Signature nhận thêm approval_code
     def validate_advance_amount_mismatch(self, approval_code: str, form_data: List[Dict], **kwargs) -> List[ValidationResult]:
@@ -31,121 +105,123 @@ class ValidationService:
         So sánh số tiền tạm ứng giữa yêu cầu của người dùng và số tiền chi của kế toán.
         Sử dụng tên trường động từ cấu hình.
         """
-        try:
-            # [LOGIC MỚI] Lấy tên trường từ cấu hình động
-            accounting_advance_field = get_field_mapping(approval_code, "accounting_advance_info")
-            expenditure_field = get_field_mapping(approval_code, "expenditure_amount")
-
-            if not accounting_advance_field or not expenditure_field:
-                return [ValidationResult.create_skipped(
-                    ValidationType.ADVANCE_AMOUNT_MISMATCH,
-                    "ℹ️ Bỏ qua: Cấu hình 'accounting_advance_info' hoặc 'expenditure_amount' bị thiếu."
-                )]
-
-            accountant_expenditures = self.field_extractor.extract_all_values_from_fieldlist(
-                form_data, accounting_advance_field, expenditure_field
-            )
-            
-            results = []
-            found_data = False
-
-            for i in range(1, 5): # Giữ nguyên logic kiểm tra 4 lần
-                user_advance_field = f"Số tiền tạm ứng lần {i}:" # Giả định tên trường này là cố định
-                user_advance_value = self.field_extractor.extract_field_value(form_data, user_advance_field)
-                
-                if user_advance_value is not None:
-                    found_data = True
-
-                if (i - 1) >= len(accountant_expenditures) or user_advance_value is None:
-                    continue
-                
-                accountant_expenditure_value = accountant_expenditures[i-1]
-                
-                try:
-                    user_amount = float(user_advance_value)
-                    accountant_amount = float(accountant_expenditure_value)
-                    
-                    if abs(user_amount - accountant_amount) >= 0.01:
-                        message = (f"❌ Lỗi Tạm ứng Lần {i}: Yêu cầu ({user_amount:,.0f}) ≠ Kế toán chi ({accountant_amount:,.0f}). "
-                                   f"Lệch: {abs(user_amount - accountant_amount):,.0f} VND")
-                        results.append(ValidationResult.create_invalid(ValidationType.ADVANCE_AMOUNT_MISMATCH, message))
-                except (ValueError, TypeError):
-                    message = f"❌ Lỗi định dạng số Tạm ứng Lần {i}."
-                    results.append(ValidationResult.create_invalid(ValidationType.ADVANCE_AMOUNT_MISMATCH, message))
-
-            if not results and found_data:
-                results.append(ValidationResult.create_valid(
-                    ValidationType.ADVANCE_AMOUNT_MISMATCH, "✅ Tất cả các lần tạm ứng đã khớp."
-                ))
+        # [LOGIC MỚI] Lấy tên trường từ cấu hình động
+        accounting_advance_field = get_field_mapping(approval_code, "accounting_advance_info")
+        expenditure_field = get_field_mapping(approval_code, "expenditure_amount")
+
+        if not accounting_advance_field or not expenditure_field:
+            return _copy_results(_SKIPPED_NO_CONFIG[ValidationType.ADVANCE_AMOUNT_MISMATCH])
+
+        form_index = kwargs.get('form_index')
+
+        # Trích xuất cả 4 lần tạm ứng chỉ với một lần duyệt form_data
+        user_advance_values = self.field_extractor.extract_field_values(
+            form_data, _ADVANCE_FIELD_SET, form_index=form_index
+        )
+        # Người dùng chưa nhập lần tạm ứng nào: bỏ qua, không cần đọc fieldList của kế toán
+        if all(value is None for value in user_advance_values.values()):
+            return _copy_results(_SKIPPED_NO_DATA[ValidationType.ADVANCE_AMOUNT_MISMATCH])
+
+        accountant_expenditures = self.field_extractor.extract_all_values_from_fieldlist(
+            form_data, accounting_advance_field, expenditure_field, form_index=form_index
+        )
+        
+        results = []
+        # Gán sẵn vào biến cục bộ để vòng lặp không phải tra thuộc tính mỗi lần
+        add_result = results.append
+        create_invalid = ValidationResult.create_invalid
+
+        # Chỉ so sánh các lần tạm ứng đã có dòng chi tương ứng của kế toán
+        compare_count = min(len(_ADVANCE_FIELDS), len(accountant_expenditures))
+        for i, user_advance_field in enumerate(_ADVANCE_FIELDS[:compare_count], 1):
+            user_advance_value = user_advance_values.get(user_advance_field)
+            if user_advance_value is None:
+                continue
             
-            if not found_data:
-                results.append(ValidationResult.create_skipped(
-                    ValidationType.ADVANCE_AMOUNT_MISMATCH, "ℹ️ Bỏ qua: Không tìm thấy dữ liệu tạm ứng để so sánh."
-                ))
+            accountant_expenditure_value = accountant_expenditures[i-1]
             
-            return results
-                
-        except Exception as e:
-            return [ValidationResult.create_error(
-                ValidationType.ADVANCE_AMOUNT_MISMATCH, f"❌ Lỗi hệ thống khi validation tiền tạm ứng: {e}"
-            )]
+            user_amount, user_error = _indexed_float(form_index, user_advance_field, user_advance_value)
+            accountant_amount, accountant_error = _to_float(accountant_expenditure_value)
+            if user_error or accountant_error:
+                message = f"❌ Lỗi định dạng số Tạm ứng Lần {i}."
+                add_result(create_invalid(ValidationType.ADVANCE_AMOUNT_MISMATCH, message))
+                continue
+
+            if not _amounts_match(user_amount, accountant_amount):
+                delta = abs(user_amount - accountant_amount)
+                message = (f"❌ Lỗi Tạm ứng Lần {i}: Yêu cầu ({user_amount:,.0f}) ≠ Kế toán chi ({accountant_amount:,.0f}). "
+                           f"Lệch: {delta:,.0f} VND")
+                add_result(create_invalid(ValidationType.ADVANCE_AMOUNT_MISMATCH, message))
+
+        if not results:
+            results.append(ValidationResult.create_valid(
+                ValidationType.ADVANCE_AMOUNT_MISMATCH, "✅ Tất cả các lần tạm ứng đã khớp."
+            ))
+        
+        return results
 
     # [THAY ĐỔI] Signature nhận thêm approval_code
-    def validate_payment_amount_mismatch(self, approval_code: str, form_data: List[Dict], **kwargs) -> ValidationResult:
+    def validate_payment_amount_mismatch(self, approval_code: str, form_data: List[Dict], **kwargs) -> List[ValidationResult]:
         """
         Validation tính nhất quán số tiền thanh toán, sử dụng tên trường động.
         """
+        # [LOGIC MỚI] Lấy tên trường từ cấu hình động
+        accounting_payment_field = get_field_mapping(approval_code, "accounting_payment_info")
+        expenditure_field = get_field_mapping(approval_code, "expenditure_amount")
+        # [LOGIC MỚI] Lấy các trường thanh toán khác từ cấu hình (ví dụ)
+        # Giả sử chúng ta thêm các key này vào field_mappings
+        remaining_payment_field = get_field_mapping(approval_code, "remaining_payment_amount") or "Số tiền còn phải thanh toán"
+        payment_field = get_field_mapping(approval_code, "payment_amount") or "Số tiền thanh toán"
+
+        if not accounting_payment_field or not expenditure_field:
+            return _copy_results(_SKIPPED_NO_CONFIG[ValidationType.PAYMENT_AMOUNT_MISMATCH])
+
+        form_index = kwargs.get('form_index')
+        payment_info_amount = self.field_extractor.extract_field_from_fieldlist(
+            form_data,  accounting_payment_field, expenditure_field, form_index=form_index
+        )
+        # Ưu tiên số tiền còn phải thanh toán; chỉ tra số tiền thanh toán khi không có
+        amount_due = self.field_extractor.extract_field_value(form_data,  remaining_payment_field, form_index=form_index)
+        if amount_due is not None:
+            compare_amount, compare_field_name = amount_due, remaining_payment_field
+        else:
+            compare_amount = self.field_extractor.extract_field_value(form_data, payment_field, form_index=form_index)
+            compare_field_name = payment_field
+
+        if payment_info_amount is None or compare_amount is None:
+            return _copy_results(_SKIPPED_NO_DATA[ValidationType.PAYMENT_AMOUNT_MISMATCH])
+
+        payment_info_float, error = _to_float(payment_info_amount)
+        if error is None:
+            compare_amount_float, error = _indexed_float(form_index, compare_field_name, compare_amount)
+        if error is not None:
+            return [ValidationResult.create_error(
+                ValidationType.PAYMENT_AMOUNT_MISMATCH, f"❌ Lỗi định dạng số tiền thanh toán: {error}"
+            )]
+
+        if _amounts_match(payment_info_float, compare_amount_float):
+            return [ValidationResult.create_valid(
+                ValidationType.PAYMENT_AMOUNT_MISMATCH, f"✅ Số tiền thanh toán nhất quán: {payment_info_float:,.0f} VND"
+            )]
+
+        delta = abs(payment_info_float - compare_amount_float)
+        message = (f"❌ Lỗi thanh toán: 'Kế toán' ({payment_info_float:,.0f}) ≠ "
+                   f"'{compare_field_name}' ({compare_amount_float:,.0f}). "
+                   f"Chênh lệch: {delta:,.0f} VND")
+        details = {"payment_info_amount": payment_info_float, "compare_amount": compare_amount_float}
+        return [ValidationResult.create_invalid(ValidationType.PAYMENT_AMOUNT_MISMATCH, message, details)]
+
+    def _run_rule(self, validation_type: ValidationType, validation_func,
+                  rule_kwargs: Dict[str, Any]) -> List[ValidationResult]:
+        """
+        Chạy một validation rule, chuyển mọi lỗi không lường trước thành kết quả ERROR.
+        """
         try:
-            # [LOGIC MỚI] Lấy tên trường từ cấu hình động
-            accounting_payment_field = get_field_mapping(approval_code, "accounting_payment_info")
-            expenditure_field = get_field_mapping(approval_code, "expenditure_amount")
-            # [LOGIC MỚI] Lấy các trường thanh toán khác từ cấu hình (ví dụ)
-            # Giả sử chúng ta thêm các key này vào field_mappings
-            remaining_payment_field = get_field_mapping(approval_code, "remaining_payment_amount") or "Số tiền còn phải thanh toán"
-            payment_field = get_field_mapping(approval_code, "payment_amount") or "Số tiền thanh toán"
-
-            if not accounting_payment_field or not expenditure_field:
-                 return ValidationResult.create_skipped(
-                    ValidationType.PAYMENT_AMOUNT_MISMATCH,
-                    "ℹ️ Bỏ qua: Cấu hình 'accounting_payment_info' hoặc 'expenditure_amount' bị thiếu."
-                )
-
-            payment_info_amount = self.field_extractor.extract_field_from_fieldlist(
-                form_data,  accounting_payment_field, expenditure_field
-            )
-            amount_due = self.field_extractor.extract_field_value(form_data,  remaining_payment_field)
-            amount_paid = self.field_extractor.extract_field_value(form_data, payment_field)
-            
-            compare_amount = amount_due if amount_due is not None else amount_paid
-            compare_field_name = remaining_payment_field if amount_due is not None else payment_field
-
-            if payment_info_amount is None or compare_amount is None:
-                return ValidationResult.create_skipped(
-                    ValidationType.PAYMENT_AMOUNT_MISMATCH,
-                    "ℹ️ Bỏ qua: Không tìm thấy đủ các trường về số tiền thanh toán để so sánh."
-                )
-
-            payment_info_float = float(payment_info_amount)
-            compare_amount_float = float(compare_amount)
-
-            if abs(payment_info_float - compare_amount_float) < 0.01:
-                return ValidationResult.create_valid(
-                    ValidationType.PAYMENT_AMOUNT_MISMATCH, f"✅ Số tiền thanh toán nhất quán: {payment_info_float:,.0f} VND"
-                )
-            else:
-                message = (f"❌ Lỗi thanh toán: 'Kế toán' ({payment_info_float:,.0f}) ≠ "
-                           f"'{compare_field_name}' ({compare_amount_float:,.0f}). "
-                           f"Chênh lệch: {abs(payment_info_float - compare_amount_float):,.0f} VND")
-                details = {"payment_info_amount": payment_info_float, "compare_amount": compare_amount_float}
-                return ValidationResult.create_invalid(ValidationType.PAYMENT_AMOUNT_MISMATCH, message, details)
-        except (ValueError, TypeError) as e:
-            return ValidationResult.create_error(
-                ValidationType.PAYMENT_AMOUNT_MISMATCH, f"❌ Lỗi định dạng số tiền thanh toán: {e}"
-            )
+            return validation_func(**rule_kwargs)
         except Exception as e:
-            return ValidationResult.create_error(
-                ValidationType.PAYMENT_AMOUNT_MISMATCH, f"❌ Lỗi không xác định khi validation tiền thanh toán: {e}"
-            )
+            return [ValidationResult.create_error(
+                validation_type, f"❌ Lỗi hệ thống khi chạy validation '{validation_type.value}': {e}"
+            )]
     
     # [THAY ĐỔI] Signature của hàm chính đã thay đổi
     def run_all_validations(self, approval_code: str, form_data: List[Dict], task_list: List[Dict], 
@@ -153,28 +229,51 @@ class ValidationService:
         """
         Chạy tất cả các validation rules đã được đăng ký cho quy trình được chỉ định.
         """
-        print(f"🚀 Bắt đầu chạy tất cả validation cho quy trình '{approval_code}'...")
+        logger.debug("🚀 Bắt đầu chạy tất cả validation cho quy trình '%s'...", approval_code)
+        if not form_data:
+            # Tất cả rule hiện tại đều chỉ đọc form_data nên không cần dispatch
+            logger.debug("⏭️ Bỏ qua toàn bộ validation: form_data rỗng")
+            return _copy_results(_SKIPPED_EMPTY_FORM)
+
         results = []
+
+        # Xây dựng chỉ mục field một lần, dùng chung cho tất cả các validator
+        form_index = self.field_extractor.build_index(form_data, _NUMERIC_FIELDS)
         
-        for validation_type, validation_func in self.validation_rules.items():
-            print(f"▶️ Đang chạy: {validation_type.value}...")
-            
-            # [THAY ĐỔI] Truyền approval_code vào mỗi hàm validation
-            result_or_list = validation_func(
-                approval_code=approval_code,
-                form_data=form_data,
-                task_list=task_list,
-                node_id=node_id
-            )
-
-            if isinstance(result_or_list, list):
-                results.extend(result_or_list)
-            else:
-                results.append(result_or_list)
-
-        invalid_count = sum(1 for r in results if not r.is_valid)
-        print(f"📈 Hoàn thành validation: Tìm thấy {invalid_count} vấn đề.")
+        rule_kwargs = dict(
+            approval_code=approval_code,
+            form_data=form_data,
+            task_list=task_list,
+            node_id=node_id,
+            form_index=form_index
+        )
+
+        for validation_type, validation_func in self._rules_seq:
+            logger.debug("▶️ Đang chạy: %s...", validation_type.value)
+            # [THAY ĐỔI] Truyền approval_code vào mỗi hàm validation.
+            # Mọi validator đều trả về danh sách kết quả nên chỉ cần extend.
+            results.extend(self._run_rule(validation_type, validation_func, rule_kwargs))
+
+        if logger.isEnabledFor(logging.DEBUG):
+            invalid_count = sum(1 for r in results if not r.is_valid)
+            logger.debug("📈 Hoàn thành validation: Tìm thấy %s vấn đề.", invalid_count)
         
         return results
 
-validation_service = ValidationService()
\ No newline at end of file
+
+_validation_service: Optional[ValidationService] = None
+
+
+def get_validation_service() -> ValidationService:
+    """Trả về instance ValidationService dùng chung, chỉ khởi tạo ở lần gọi đầu tiên."""
+    global _validation_service
+    if _validation_service is None:
+        _validation_service = ValidationService()
+    return _validation_service
+
+
+def __getattr__(name: str):
+    # Giữ tương thích với `from ...validation_service import validation_service`
+    if name == "validation_service":
+        return get_validation_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,11 +1,20 @@
+import logging
+
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 
 # Core imports
 from app.core.bootstrap.application import app_bootstrap
 from app.core.config.settings import settings
 
+# Cấu hình logging cho các module dùng logging.getLogger(__name__)
+logging.basicConfig(
+    level=settings.LOG_LEVEL,
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+
 # Router imports
 from app.core.routers.webhook import router as webhook_router
 from app.core.routers.monitoring import router as monitoring_router
@@ -27,7 +36,8 @@ app = FastAPI(
     title="Lark Approval QR Generator", 
     description="Enhanced QR Generator với DDD Architecture",
     version="2.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Include routers
@@ -36,23 +46,31 @@ app.include_router(monitoring_router, prefix="/monitoring", tags=["Monitoring"])
 app.include_router(qr_router, prefix="/api", tags=["QR Generation"])  
 app.include_router(notification_router, prefix="/api", tags=["Notification"])
 
+# Phần tĩnh của response "/" - dựng một lần khi import
+_ROOT_INFO = {
+    "message": "Lark Approval QR Generator API",
+    "architecture": "Domain-Driven Design (DDD)",
+    "version": "2.0.0",
+}
+
 @app.get("/")
 async def root():
     """Root endpoint"""
     startup_info = app_bootstrap.get_startup_info()
     return {
-        "message": "Lark Approval QR Generator API",
-        "architecture": "Domain-Driven Design (DDD)",
-        "version": "2.0.0",
+        **_ROOT_INFO,
         "status": "healthy" if startup_info["is_initialized"] else "initializing",
         "startup_info": startup_info
     }
 
 if __name__ == "__main__":
+    # Ngoài chế độ debug (không reload) thì chạy trên uvloop + httptools (có sẵn qua uvicorn[standard])
+    server_options = {} if settings.DEBUG else {"loop": "uvloop", "http": "httptools"}
     uvicorn.run(
         "main:app", 
         host="0.0.0.0", 
         port=settings.PORT,
         reload=settings.DEBUG,
-        log_level="info"
+        log_level="info",
+        **server_options
     )
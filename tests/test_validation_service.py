@@ -0,0 +1,55 @@
+import unittest
+
+from app.domains.validation.models import ValidationStatus, ValidationType
+from app.domains.validation.services.validation_service import ValidationService
+from app.core.config.node_config import APPROVAL_WORKFLOWS
+
+
+ADVANCE_CONFIG_MISSING = "ℹ️ Bỏ qua: Cấu hình 'accounting_advance_info' hoặc 'expenditure_amount' bị thiếu."
+ADVANCE_NO_DATA = "ℹ️ Bỏ qua: Không tìm thấy dữ liệu tạm ứng để so sánh."
+
+
+def _advance_result(results):
+    return next(r for r in results if r.validation_type == ValidationType.ADVANCE_AMOUNT_MISMATCH)
+
+
+class ValidationServiceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.service = ValidationService()
+
+    def test_unconfigured_workflow_without_advance_fields_reports_missing_config(self):
+        # Quy trình không có field_mappings phải báo thiếu cấu hình, kể cả khi form không có trường tạm ứng
+        form_data = [{"name": "Số tiền thanh toán", "type": "number", "value": "100"}]
+
+        results = self.service.run_all_validations("UNKNOWN-APPROVAL-CODE", form_data, [], "node")
+
+        advance = _advance_result(results)
+        self.assertEqual(advance.status, ValidationStatus.SKIPPED)
+        self.assertEqual(advance.message, ADVANCE_CONFIG_MISSING)
+
+    def test_configured_workflow_without_advance_fields_reports_no_data(self):
+        approval_code = next(iter(APPROVAL_WORKFLOWS))
+        form_data = [{"name": "Số tiền thanh toán", "type": "number", "value": "100"}]
+
+        results = self.service.run_all_validations(approval_code, form_data, [], "node")
+
+        advance = _advance_result(results)
+        self.assertEqual(advance.status, ValidationStatus.SKIPPED)
+        self.assertEqual(advance.message, ADVANCE_NO_DATA)
+
+    def test_skipped_results_are_not_shared_between_calls(self):
+        form_data = [{"name": "Số tiền thanh toán", "type": "number", "value": "100"}]
+
+        first = _advance_result(self.service.run_all_validations("UNKNOWN-APPROVAL-CODE", form_data, [], "node"))
+        first.message = "changed"
+        first.details["note"] = "changed"
+
+        second = _advance_result(self.service.run_all_validations("UNKNOWN-APPROVAL-CODE", form_data, [], "node"))
+        self.assertIsNot(first, second)
+        self.assertEqual(second.message, ADVANCE_CONFIG_MISSING)
+        self.assertEqual(second.details, {})
+
+
+if __name__ == "__main__":
+    unittest.main()